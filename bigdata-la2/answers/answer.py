@@ -1,12 +1,21 @@
+import hashlib
+import itertools
 import os
+import random
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pyspark.rdd import RDD
 from pyspark.sql import Row
 from pyspark.sql import DataFrame
 from pyspark.sql import SparkSession
 from pyspark.sql.functions import lit
 from pyspark.sql.functions import desc
-from pyspark.sql.functions import avg, col, lit, pow, sqrt, mean
+from pyspark.sql.functions import avg, col, lit, pow, sqrt, mean, split
+from pyspark.sql.functions import array, broadcast, count, explode, struct
+from pyspark.sql.functions import max as max_, sum as sum_
+from pyspark.sql.functions import coalesce
+from pyspark.sql.types import StructType, StructField, LongType, DoubleType
 from pyspark.ml.evaluation import RegressionEvaluator
 from pyspark.ml.recommendation import ALS
 
@@ -31,35 +40,399 @@ These functions are here to help you. Instructions will tell you when
 you should use them. Don't modify them!
 '''
 
+# Settings of the shared Spark session: adaptive query execution
+# coalesces small shuffle partitions, Arrow speeds up conversions from
+# and to pandas, and Kryo is faster than Java serialization.
+SPARK_CONFIG = {
+    "spark.sql.adaptive.enabled": "true",
+    "spark.sql.adaptive.coalescePartitions.enabled": "true",
+    "spark.sql.execution.arrow.pyspark.enabled": "true",
+    "spark.serializer": "org.apache.spark.serializer.KryoSerializer",
+}
+
+# Input bytes per shuffle partition, see init_spark
+SHUFFLE_PARTITION_BYTES = 64 * 1024 * 1024
+MAX_SHUFFLE_PARTITIONS = 200
+
+_spark = None
+_spark_startup_seconds = None
+
+
+def _input_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, dirs, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
 #Initialize a spark session.
-def init_spark():
-    spark = SparkSession \
-        .builder \
-        .appName("Python Spark SQL basic example") \
-        .config("spark.some.config.option", "some-value") \
-        .getOrCreate()
-    return spark
+def init_spark(*inputs):
+    '''
+    Return the Spark session shared by all the functions, creating it
+    with SPARK_CONFIG on first call (or after it was stopped). When input
+    files or directories are given, the number of shuffle partitions is
+    set to one per SHUFFLE_PARTITION_BYTES of input, between 1 and
+    MAX_SHUFFLE_PARTITIONS, instead of Spark's default of 200.
+    '''
+    global _spark, _spark_startup_seconds
+    if _spark is None or _spark.sparkContext._jsc is None:
+        start = time.perf_counter()
+        builder = SparkSession.builder.appName("Python Spark SQL basic example")
+        for key, value in SPARK_CONFIG.items():
+            builder = builder.config(key, value)
+        _spark = builder.getOrCreate()
+        _spark_startup_seconds = time.perf_counter() - start
+    if inputs:
+        size = sum(_input_bytes(path) for path in inputs)
+        partitions = min(MAX_SHUFFLE_PARTITIONS, max(1, -(-size // SHUFFLE_PARTITION_BYTES)))
+        _spark.conf.set("spark.sql.shuffle.partitions", partitions)
+    return _spark
+
+
+def spark_startup_seconds():
+    '''
+    Return the time (in seconds) taken to create the shared Spark
+    session, or None if it was not created yet.
+    '''
+    return _spark_startup_seconds
 
 #Useful functions to print RDDs and Dataframes.
-def toCSVLineRDD(rdd):
+def toCSVLineRDD(rdd, out=None):
     '''
-    This function convert an RDD or a DataFrame into a CSV string
+    This function convert an RDD or a DataFrame into a CSV string, with
+    one line per element, in the order of the RDD. If the file object
+    *out* is given, the lines are written to it one partition at a time
+    instead, and None is returned.
     '''
-    a = rdd.map(lambda row: ",".join([str(elt) for elt in row]))\
-           .reduce(lambda x,y: '\n'.join([x,y]))
-    return a + '\n'
-
-def toCSVLine(data):
+    lines = rdd.map(lambda row: ",".join([str(elt) for elt in row]))
+    if out is not None:
+        out.writelines(line + '\n' for line in lines.toLocalIterator())
+        return None
+    # One string per partition, concatenated in partition order
+    chunks = lines.mapPartitions(lambda part: [''.join(line + '\n' for line in part)])
+    return ''.join(chunks.collect())
+
+def toCSVLine(data, out=None):
     '''
-    Convert an RDD or a DataFrame into a CSV string
+    Convert an RDD or a DataFrame into a CSV string (or write it to the
+    file object *out*, see toCSVLineRDD)
     '''
     if isinstance(data, RDD):
-        return toCSVLineRDD(data)
+        return toCSVLineRDD(data, out)
     elif isinstance(data, DataFrame):
-        return toCSVLineRDD(data.rdd)
+        return toCSVLineRDD(data.rdd, out)
     return None
 
-def basic_als_recommender(filename, seed):
+
+'''
+RATINGS LOADING
+
+All the functions below work on the same ratings file and the same
+80/20 training/test split. Parsing the file and sampling the split are
+done once per (file content, seed): the result is stored as a Parquet
+dataset partitioned by split under RATINGS_CACHE_DIR, together with a
+sidecar file holding the SHA-256 of the source file. The DataFrames
+read back from it are persisted and shared by every function.
+'''
+
+RATINGS_SCHEMA = StructType([
+    StructField("userId", LongType()),
+    StructField("movieId", LongType()),
+    StructField("rating", DoubleType()),
+    StructField("timestamp", LongType()),
+])
+
+RATINGS_CACHE_DIR = os.path.join(".cache", "ratings")
+SOURCE_HASH_FILE = "_SOURCE_SHA256"
+
+# (path, mtime, seed) -> (spark, dataset, ratings, training, test)
+_ratings_cache = {}
+
+
+def _file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def parse_ratings(spark, filename):
+    '''
+    Return the DataFrame of the '::'-separated ratings in *filename*,
+    typed according to RATINGS_SCHEMA. Parsing is expressed with the
+    *split* and *cast* column expressions, so that it runs in the JVM
+    and no row is pickled to a Python worker.
+    '''
+    return spark.read.text(filename).select(_ratings_columns())
+
+
+def _ratings_columns():
+    # Typed RATINGS_SCHEMA columns of a text DataFrame of ratings lines
+    fields = split(col("value"), "::")
+    return [fields[i].cast(field.dataType).alias(field.name)
+            for i, field in enumerate(RATINGS_SCHEMA.fields)]
+
+
+def ratings_dataset_path(filename, seed):
+    '''
+    Return the directory of the Parquet dataset holding the split of
+    *filename* for *seed*.
+    '''
+    path = os.path.abspath(filename)
+    name = os.path.splitext(os.path.basename(path))[0]
+    path_id = hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(RATINGS_CACHE_DIR, "%s-%s" % (name, path_id),
+                        "seed-%d" % seed)
+
+
+def ingest_ratings(filename, seed):
+    '''
+    Convert the MovieLens ratings in *filename* into a typed Parquet
+    dataset partitioned by split ('train' or 'test'), unless the dataset
+    already exists for the current content of the file. The split is
+    the 80%/20% ''DataFrame.randomSplit'' of the ratings with *seed*.
+    Return the path of the dataset.
+    '''
+    dataset = ratings_dataset_path(filename, seed)
+    sidecar = os.path.join(dataset, SOURCE_HASH_FILE)
+    digest = _file_sha256(filename)
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            if f.read().strip() == digest:
+                return dataset
+
+    spark = init_spark(filename)
+    ratings = parse_ratings(spark, os.path.abspath(filename))
+    (training, test) = ratings.randomSplit([0.8, 0.2], seed)
+    training.withColumn("split", lit("train")) \
+            .unionByName(test.withColumn("split", lit("test"))) \
+            .write.partitionBy("split").parquet(dataset, mode="overwrite")
+    # Written last, so that an interrupted ingest is redone on next call
+    with open(sidecar, "w") as f:
+        f.write(digest + "\n")
+    return dataset
+
+
+def _unpersist_ratings(entry, spark):
+    # DataFrames of a stopped session cannot be unpersisted
+    if entry[0] is spark:
+        entry[1].unpersist()
+
+
+def load_ratings(filename, seed):
+    '''
+    Return the tuple (ratings, training, test) of persisted DataFrames
+    for the MovieLens ratings in *filename*, where training and test are
+    the 80%/20% split obtained with ''DataFrame.randomSplit'' and *seed*.
+    The DataFrames are read from the Parquet dataset built by
+    ingest_ratings, so that the text file is parsed once per content and
+    seed. Results are also cached in memory and invalidated when the
+    file is modified or the Spark session changes.
+    '''
+    spark = init_spark(filename)
+    path = os.path.abspath(filename)
+    key = (path, os.path.getmtime(path), seed)
+    entry = _ratings_cache.get(key)
+    if entry is not None and entry[0] is spark:
+        return entry[2:]
+
+    # Drop the splits of older versions of the file (or of a stopped session)
+    for stale in [k for k in _ratings_cache if k[0] == path and k[2] == seed]:
+        _unpersist_ratings(_ratings_cache.pop(stale), spark)
+
+    # The split column is a partition column: filtering on it prunes files
+    dataset = spark.read.parquet(ingest_ratings(path, seed)).persist()
+    columns = RATINGS_SCHEMA.fieldNames()
+    ratings = dataset.select(columns)
+    training = dataset.where(col("split") == "train").select(columns)
+    test = dataset.where(col("split") == "test").select(columns)
+    entry = (spark, dataset, ratings, training, test)
+    _ratings_cache[key] = entry
+    return entry[2:]
+
+
+'''
+BASELINE BIASES
+
+The baseline prediction of a rating is user_mean + item_mean -
+global_mean, where the means are computed on the training set. The
+BaselineBias model computes the user and item means in one aggregation
+pass and attaches them to ratings with joins. There are usually far
+fewer users and items than ratings, so a mean table is broadcast when its
+estimated size is below a threshold; otherwise it is joined with a
+shuffled hash join.
+'''
+
+# Default maximum estimated size of a broadcast mean table, as Spark's
+# spark.sql.autoBroadcastJoinThreshold. A negative value disables
+# broadcasting.
+BIAS_BROADCAST_THRESHOLD = 10 * 1024 * 1024
+
+# Estimated size of a (id, mean) row in a broadcast hash relation
+BIAS_ROW_BYTES = 48
+
+
+def _unpersist_checkpoint(df):
+    # The blocks of a local checkpoint belong to the RDD of its LogicalRDD
+    # plan, which DataFrame.unpersist does not release.
+    if df._sc._jsc is not None:
+        df._jdf.queryExecution().logical().rdd().unpersist(False)
+
+
+class BaselineBias:
+    '''
+    Baseline bias model fitted on a ratings DataFrame with columns
+    userId, movieId and rating. After *fit*, the following attributes are
+    available:
+    - user_means: persisted DataFrame (userId, user_mean, user_count)
+    - item_means: persisted DataFrame (movieId, item_mean, item_count)
+    - global_mean: the mean of the fitted ratings, unless a global mean
+      (computed over <global_count> ratings) was passed to the
+      constructor.
+    - join_strategy: the join used by *transform* for each mean table,
+      {'user': ..., 'item': ...}, either 'broadcast' or 'shuffle_hash',
+      chosen by comparing the table size to *broadcast_threshold* bytes.
+    The means can then be updated with new ratings with *update*. The
+    statistics are local checkpoints, released by *update* and
+    *unpersist*: DataFrames returned by *transform* before them cannot be
+    computed afterwards.
+    '''
+
+    def __init__(self, global_mean=None, global_count=None,
+                 broadcast_threshold=BIAS_BROADCAST_THRESHOLD):
+        self.global_mean = global_mean
+        self.global_count = global_count
+        self.broadcast_threshold = broadcast_threshold
+        self.user_means = None
+        self.item_means = None
+        self.join_strategy = None
+        self._fixed_global = global_mean is not None
+        self._stats = None
+
+    @staticmethod
+    def _sums(ratings):
+        # Every rating is counted once per grouping: by user, by item and
+        # globally, so that a single shuffle computes all the sums.
+        keyed = ratings.select(explode(array(
+            struct(lit("user").alias("kind"), col("userId").alias("id"), col("rating")),
+            struct(lit("item").alias("kind"), col("movieId").alias("id"), col("rating")),
+            struct(lit("all").alias("kind"), lit(None).cast("long").alias("id"), col("rating"))
+        )).alias("r")).select("r.*")
+        return keyed.groupBy("kind", "id") \
+                    .agg(sum_(col("rating")).alias("sum"), count(col("rating")).alias("count"))
+
+    def _set_stats(self, stats):
+        previous = self._stats
+        # The local checkpoint materializes the statistics and truncates
+        # their lineage: otherwise every update would add a union and an
+        # aggregation to the plan of all the following ones.
+        self._stats = stats.localCheckpoint()
+        self.user_means = self._stats.where(col("kind") == "user") \
+                                     .select(col("id").alias("userId"),
+                                             col("mean").alias("user_mean"),
+                                             col("count").alias("user_count"))
+        self.item_means = self._stats.where(col("kind") == "item") \
+                                     .select(col("id").alias("movieId"),
+                                             col("mean").alias("item_mean"),
+                                             col("count").alias("item_count"))
+
+        # One row per kind: the number of means, and the global sums
+        summary = {row["kind"]: row for row in
+                   self._stats.groupBy("kind")
+                              .agg(count(lit(1)).alias("rows"), max_(col("mean")).alias("mean"),
+                                   max_(col("count")).alias("count"))
+                              .collect()}
+        if not self._fixed_global:
+            self.global_mean = summary["all"]["mean"]
+            self.global_count = summary["all"]["count"]
+        self.join_strategy = {kind: self._choose_strategy(summary[kind]["rows"] if kind in summary else 0)
+                              for kind in ("user", "item")}
+        # Released only now that the new statistics, which may be derived
+        # from them, were checkpointed.
+        if previous is not None:
+            _unpersist_checkpoint(previous)
+
+    def fit(self, ratings):
+        self._set_stats(self._sums(ratings).withColumn("mean", col("sum") / col("count")))
+        return self
+
+    def update(self, ratings):
+        '''
+        Add the ratings of the DataFrame *ratings* to the fitted means,
+        without reading the previously fitted ratings again. Users and
+        items seen for the first time get their own means.
+        '''
+        new = self._sums(ratings).persist()
+        if self._fixed_global and self.global_count:
+            total = new.where(col("kind") == "all").first()
+            if total is not None:
+                self.global_mean = (self.global_mean * self.global_count + total["sum"]) \
+                                   / (self.global_count + total["count"])
+                self.global_count += total["count"]
+
+        old = self._stats.select("kind", "id", "sum", "count")
+        self._set_stats(old.unionByName(new)
+                           .groupBy("kind", "id")
+                           .agg(sum_(col("sum")).alias("sum"), sum_(col("count")).alias("count"))
+                           .withColumn("mean", col("sum") / col("count")))
+        new.unpersist()
+        return self
+
+    def _choose_strategy(self, rows):
+        if rows * BIAS_ROW_BYTES <= self.broadcast_threshold:
+            return "broadcast"
+        return "shuffle_hash"
+
+    def _lookup(self, table, kind):
+        if self.join_strategy[kind] == "broadcast":
+            return broadcast(table)
+        return table.hint("shuffle_hash")
+
+    def transform(self, ratings):
+        '''
+        Return *ratings* with the additional columns user_mean, item_mean
+        and baseline (user_mean + item_mean - global_mean). Users and
+        items absent from the fitted ratings get null means.
+        '''
+        user_means = self._lookup(self.user_means.select("userId", "user_mean"), "user")
+        item_means = self._lookup(self.item_means.select("movieId", "item_mean"), "item")
+        return ratings.join(user_means, "userId", "left")\
+                      .join(item_means, "movieId", "left")\
+                      .withColumn("baseline", col("user_mean") + col("item_mean") - lit(self.global_mean))
+
+    def unpersist(self):
+        if self._stats is not None:
+            _unpersist_checkpoint(self._stats)
+
+
+# (path, mtime, seed) -> (training, BaselineBias)
+_bias_cache = {}
+
+
+def load_baseline_bias(filename, seed):
+    '''
+    Return the BaselineBias fitted on the training set of *filename* for
+    *seed*, with the global mean computed on all the ratings. The model
+    is cached along with the split returned by load_ratings.
+    '''
+    ratings, training, test = load_ratings(filename, seed)
+    path = os.path.abspath(filename)
+    key = (path, os.path.getmtime(path), seed)
+    entry = _bias_cache.get(key)
+    if entry is not None and entry[0] is training:
+        return entry[1]
+
+    for stale in [k for k in _bias_cache if k[0] == path and k[2] == seed]:
+        _bias_cache.pop(stale)[1].unpersist()
+
+    total = ratings.select(avg(col("rating")), count(col("rating"))).first()
+    bias = BaselineBias(total[0], total[1]).fit(training)
+    _bias_cache[key] = (training, bias)
+    return bias
+
+
+def basic_als_recommender(filename, seed, engine="spark"):
     '''
     This function must print the RMSE of recommendations obtained
     through ALS collaborative filtering, similarly to the example at
@@ -75,14 +448,18 @@ def basic_als_recommender(filename, seed):
     - regParam: 0.01
     - coldStartStrategy: 'drop'
     Test file: tests/test_basic_als.py
+
+    With engine='numpy', the model is fitted in process by
+    answers.numpy_als instead, without starting Spark (see that module
+    for how its training/test split differs).
     '''
-    spark = init_spark()
-    lines = spark.read.text(filename).rdd
-    parts = lines.map(lambda row: row.value.split("::"))
-    ratingsRDD = parts.map(lambda p: Row(userId=int(p[0]), movieId=int(p[1]),
-                                        rating=float(p[2]), timestamp=int(p[3])))
-    ratings = spark.createDataFrame(ratingsRDD)
-    (training, test) = ratings.randomSplit([0.8, 0.2], seed)
+    if engine == "numpy":
+        from answers.numpy_als import numpy_als_rmse
+        return numpy_als_rmse(filename, seed, rank=70, maxIter=5, regParam=0.01)
+    if engine != "spark":
+        raise ValueError("Unknown engine: %s" % engine)
+
+    ratings, training, test = load_ratings(filename, seed)
 
     # Build the recommendation model using ALS on the training data
     als = ALS(maxIter=5, rank=70, regParam=0.01, userCol="userId", itemCol="movieId", ratingCol="rating",
@@ -105,13 +482,7 @@ def global_average(filename, seed):
     sets should be determined as before (e.g: as in function basic_als_recommender).
     Test file: tests/test_global_average.py
     '''
-    spark = init_spark()
-    lines = spark.read.text(filename).rdd
-    parts = lines.map(lambda row: row.value.split("::"))
-    ratingsRDD = parts.map(lambda p: Row(userId=int(p[0]), movieId=int(p[1]),
-                                        rating=float(p[2]), timestamp=int(p[3])))
-    ratings = spark.createDataFrame(ratingsRDD)
-    (training, test) = ratings.randomSplit([0.8, 0.2], seed)
+    ratings, training, test = load_ratings(filename, seed)
     return training.selectExpr("avg(rating)").collect()[0][0]
 
 
@@ -124,13 +495,7 @@ def global_average_recommender(filename, seed):
     sets should be determined as before. You can add a column to an existing DataFrame with function *.withColumn(...)*.
     Test file: tests/test_global_average_recommender.py
     '''
-    spark = init_spark()
-    lines = spark.read.text(filename).rdd
-    parts = lines.map(lambda row: row.value.split("::"))
-    ratingsRDD = parts.map(lambda p: Row(userId=int(p[0]), movieId=int(p[1]),
-                                        rating=float(p[2]), timestamp=int(p[3])))
-    ratings = spark.createDataFrame(ratingsRDD)
-    (training, test) = ratings.randomSplit([0.8, 0.2], seed)
+    ratings, training, test = load_ratings(filename, seed)
     global_avg_rating = training.selectExpr("avg(rating)").collect()[0][0]
     training = training.withColumn("prediction", lit(global_avg_rating))
     test = test.withColumn("prediction", lit(global_avg_rating))
@@ -166,23 +531,12 @@ def means_and_interaction(filename, seed, n):
     Note, this function should return a list of collected Rows. Please, have a
     look at the test file to ensure you have the right format.
     '''
-    spark = init_spark()
-    lines = spark.read.text(filename).rdd
-    parts = lines.map(lambda row: row.value.split("::"))
-    ratingsRDD = parts.map(lambda p: Row(userId=int(p[0]), movieId=int(p[1]),
-                                        rating=float(p[2])))
-    ratings = spark.createDataFrame(ratingsRDD)
-    (training, test) = ratings.randomSplit([0.8, 0.2], seed)
+    ratings, training, test = load_ratings(filename, seed)
+    bias = load_baseline_bias(filename, seed)
 
-    global_mean = ratings.select(avg(col("rating"))).first()[0]
-
-    user_means = training.groupBy("userId").agg(avg(col("rating")).alias("user_mean"))
-    item_means = training.groupBy("movieId").agg(avg(col("rating")).alias("item_mean"))
-
-    # Compute user-item interaction on test set
-    training_interactions = training.join(user_means, "userId", "left")\
-                           .join(item_means, "movieId", "left")\
-                           .withColumn("user_item_interaction", col("rating") - (col("user_mean")+col("item_mean")-lit(global_mean)))\
+    # Compute user-item interaction on training set
+    training_interactions = bias.transform(training)\
+                           .withColumn("user_item_interaction", col("rating") - col("baseline"))\
                            .select("userId", "movieId", "rating", "user_mean", "item_mean", "user_item_interaction")\
                            .orderBy(["userId", "movieId"], ascending=[True, True])\
                            .limit(n)
@@ -202,29 +556,12 @@ def als_with_bias_recommender(filename, seed):
     as before and be initialized with the random seed passed as 
     parameter. Test file: tests/test_als_with_bias_recommender.py
     '''
-    spark = init_spark()
-    lines = spark.read.text(filename).rdd
-    parts = lines.map(lambda row: row.value.split("::"))
-    ratingsRDD = parts.map(lambda p: Row(userId=int(p[0]), movieId=int(p[1]),
-                                         rating=float(p[2])))
-    ratings = spark.createDataFrame(ratingsRDD)
-    (training, test) = ratings.randomSplit([0.8, 0.2], seed)
-
-    # Compute global mean
-    global_mean = ratings.select(avg(col("rating"))).first()[0]
-
-    # Compute user means on training set
-    user_means = training.groupBy("userId").agg(avg(col("rating")).alias("user_mean"))
-
-    # Compute item means on training set
-    item_means = training.groupBy("movieId").agg(avg(col("rating")).alias("item_mean"))
+    ratings, training, test = load_ratings(filename, seed)
+    bias = load_baseline_bias(filename, seed)
 
     # Add user and item biases to training set
-    training_biases = training.join(user_means, "userId", "left")\
-                              .join(item_means, "movieId", "left")\
-                              .withColumn("user_bias", col("user_mean") - lit(global_mean))\
-                              .withColumn("item_bias", col("item_mean") - lit(global_mean))\
-                              .withColumn("rating_biased", col("rating") - (col("user_mean")+col("item_mean")-lit(global_mean)))
+    training_biases = bias.transform(training)\
+                          .withColumn("rating_biased", col("rating") - col("baseline"))
 
     # Fit ALS model
     als = ALS(maxIter=5, rank=70, regParam=0.01, userCol="userId", itemCol="movieId", ratingCol="rating_biased",
@@ -232,14 +569,150 @@ def als_with_bias_recommender(filename, seed):
     model = als.fit(training_biases)
 
     # Compute predictions on test set
-    test_interactions = test.join(user_means, "userId", "left")\
-                            .join(item_means, "movieId", "left")\
-                            .select("userId", "movieId", "rating", "user_mean", "item_mean")
+    test_interactions = bias.transform(test)\
+                            .select("userId", "movieId", "rating", "baseline")
 
-    predictions = model.transform(test_interactions).withColumn("prediction", col("prediction")+col("user_mean")+col("item_mean")-lit(global_mean))
+    predictions = model.transform(test_interactions).withColumn("prediction", col("prediction")+col("baseline"))
 
     # Compute RMSE
     evaluator = RegressionEvaluator(metricName="rmse", labelCol="rating", predictionCol="prediction")
     rmse = evaluator.evaluate(predictions)
 
     return rmse
+
+
+'''
+HYPERPARAMETER SEARCH
+
+Grid or random search over the ALS parameters rank, regParam, maxIter
+and implicitPrefs. The ratings are loaded and split once with
+load_ratings, and the configurations are fitted and evaluated as
+concurrent Spark jobs submitted from a bounded pool of threads.
+'''
+
+ALS_SEARCH_SPACE = {
+    "rank": [10, 30, 70],
+    "regParam": [0.001, 0.01, 0.1],
+    "maxIter": [5, 10],
+    "implicitPrefs": [False, True],
+}
+
+
+def als_grid(search_space=ALS_SEARCH_SPACE):
+    '''
+    Return the list of all the ALS configurations (dictionaries) of the
+    cartesian product of the values in *search_space*.
+    '''
+    names = sorted(search_space)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[search_space[name] for name in names])]
+
+
+def als_random_configs(n, seed, search_space=ALS_SEARCH_SPACE):
+    '''
+    Return <n> distinct ALS configurations sampled without replacement
+    from the grid of *search_space*, using *seed*.
+    '''
+    grid = als_grid(search_space)
+    return random.Random(seed).sample(grid, min(n, len(grid)))
+
+
+def _evaluate_als(training, test, seed, config):
+    als = ALS(userCol="userId", itemCol="movieId", ratingCol="rating",
+              coldStartStrategy="drop", seed=seed, **config)
+    start = time.perf_counter()
+    model = als.fit(training)
+    fit_seconds = time.perf_counter() - start
+
+    # Predictions are computed lazily, by the evaluation job
+    start = time.perf_counter()
+    evaluator = RegressionEvaluator(metricName="rmse", labelCol="rating",
+                                    predictionCol="prediction")
+    rmse = evaluator.evaluate(model.transform(test))
+    transform_seconds = time.perf_counter() - start
+    return Row(**config, rmse=rmse, fit_seconds=fit_seconds,
+               transform_seconds=transform_seconds)
+
+
+def als_search(filename, seed, configs, max_workers=4):
+    '''
+    Fit an ALS model for every configuration of *configs* (dictionaries
+    of ALS parameters, see als_grid and als_random_configs) on the
+    training set of *filename* for *seed*, and evaluate its RMSE on the
+    test set. At most <max_workers> configurations are evaluated at the
+    same time.
+
+    Return value: a list of Rows with the configuration parameters and
+    the columns rmse, fit_seconds and transform_seconds, ordered by
+    ascending rmse.
+    '''
+    ratings, training, test = load_ratings(filename, seed)
+    # Materialize the persisted split before the concurrent jobs read it
+    training.count()
+    test.count()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda config: _evaluate_als(training, test, seed, config),
+                                configs))
+    return sorted(results, key=lambda row: row["rmse"])
+
+
+'''
+STREAMING
+
+Monitoring of the baselines on a stream of ratings: new files of
+'::'-separated ratings lines appended to a directory are read as
+micro-batches with Structured Streaming. Every micro-batch is first
+used to evaluate the global-average and bias baselines fitted on all the
+previous batches, then folded into their running means with
+BaselineBias.update, so that the RMSE reflects the drift of the
+baselines without reprocessing past ratings.
+'''
+
+
+def monitor_ratings_stream(directory, on_batch, max_files_per_trigger=None, checkpoint=None):
+    '''
+    Start monitoring the ratings files added to *directory*, and return
+    the StreamingQuery. After every micro-batch, *on_batch* is called
+    with a Row with the following columns:
+    - batch_id
+    - count # number of ratings in the batch
+    - global_rmse # RMSE of the global average of the previous batches
+    - bias_rmse # RMSE of user_mean + item_mean - global_mean, where
+                # unknown users or items get the global mean
+    - global_mean # after the batch
+    The RMSEs are None for the first batch, which has no prior baseline.
+    '''
+    spark = init_spark()
+    reader = spark.readStream
+    if max_files_per_trigger is not None:
+        reader = reader.option("maxFilesPerTrigger", max_files_per_trigger)
+    ratings = reader.text(directory).select(_ratings_columns())
+    state = {"bias": None}
+
+    def process(batch, batch_id):
+        batch = batch.select("userId", "movieId", "rating").persist()
+        bias = state["bias"]
+        if bias is None:
+            total = batch.select(count(lit(1))).first()[0]
+            global_rmse = bias_rmse = None
+            if total:
+                state["bias"] = bias = BaselineBias().fit(batch)
+        else:
+            global_mean = lit(bias.global_mean)
+            baseline = coalesce(col("user_mean"), global_mean) + coalesce(col("item_mean"), global_mean) \
+                       - global_mean
+            errors = bias.transform(batch).select(
+                pow(col("rating") - global_mean, 2).alias("global_error"),
+                pow(col("rating") - baseline, 2).alias("bias_error"))
+            metrics = errors.select(count(lit(1)), sqrt(avg("global_error")), sqrt(avg("bias_error"))).first()
+            total, global_rmse, bias_rmse = metrics
+            if total:
+                bias.update(batch)
+        batch.unpersist()
+        on_batch(Row(batch_id=batch_id, count=total, global_rmse=global_rmse, bias_rmse=bias_rmse,
+                     global_mean=bias.global_mean if bias is not None else None))
+
+    writer = ratings.writeStream.foreachBatch(process)
+    if checkpoint is not None:
+        writer = writer.option("checkpointLocation", checkpoint)
+    return writer.start()
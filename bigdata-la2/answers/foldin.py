@@ -0,0 +1,109 @@
+'''
+INCREMENTAL UPDATES
+
+Fold-in of new ratings into a fitted (explicit) ALS model without
+retraining it. The item factors are kept fixed, and only the factors of
+the users having new ratings are recomputed, by solving the same
+regularized least-squares problem as one ALS half-iteration:
+
+    (V_u^T V_u + regParam * n_u * I) x_u = V_u^T r_u
+
+where V_u are the factors of the n_u items rated by user u and r_u are
+its ratings. New users get factors the same way. Ratings of items
+unknown to the model are kept, but cannot contribute to the factors
+until the model is retrained.
+
+The baseline biases of als_with_bias_recommender are updated with
+answers.answer.BaselineBias.update.
+'''
+import numpy as np
+
+from answers.serving import export_factors, rating_arrays
+
+
+class FoldInALS:
+    '''
+    ALS factors that can be updated with new ratings. *rated_users*,
+    *rated_items* and *ratings* are the arrays of the ratings the
+    factors were fitted on, which are needed to recompute the factors of
+    a user with its whole history.
+    '''
+
+    def __init__(self, user_ids, user_factors, item_ids, item_factors, reg_param,
+                 rated_users=(), rated_items=(), ratings=()):
+        self.reg_param = reg_param
+        self.user_ids = list(np.asarray(user_ids).tolist())
+        self.user_factors = np.array(user_factors, dtype=np.float64)
+        self.item_ids = np.asarray(item_ids)
+        self.item_factors = np.asarray(item_factors, dtype=np.float64)
+        self._user_rows = {user: row for row, user in enumerate(self.user_ids)}
+        self._item_rows = {item: row for row, item in enumerate(self.item_ids.tolist())}
+        # user id -> list of (item ids, ratings) chunks
+        self._history = {}
+        self._add_history(np.asarray(rated_users), np.asarray(rated_items), np.asarray(ratings))
+
+    @classmethod
+    def from_model(cls, model, ratings, reg_param, rating_col="rating"):
+        '''
+        Build from the fitted ALS *model*, its regParam <reg_param>, and
+        the ratings DataFrame *ratings* it was fitted on.
+        '''
+        return cls(*export_factors(model), reg_param, *rating_arrays(ratings, rating_col))
+
+    def _add_history(self, users, items, ratings):
+        order = np.argsort(users, kind="stable")
+        users, items, ratings = users[order], items[order], ratings[order]
+        bounds = np.flatnonzero(np.diff(users)) + 1
+        for chunk_users, chunk_items, chunk_ratings in zip(np.split(users, bounds),
+                                                           np.split(items, bounds),
+                                                           np.split(ratings, bounds)):
+            if len(chunk_users):
+                self._history.setdefault(chunk_users[0].item(), []) \
+                             .append((chunk_items, chunk_ratings))
+
+    def _solve(self, user):
+        chunks = self._history[user]
+        items = np.concatenate([chunk[0] for chunk in chunks])
+        ratings = np.concatenate([chunk[1] for chunk in chunks])
+        rows = np.array([self._item_rows.get(item, -1) for item in items.tolist()], dtype=np.int64)
+        known = rows >= 0
+        factors = self.item_factors[rows[known]]
+        rank = self.item_factors.shape[1]
+        if not known.any():
+            return np.zeros(rank)
+        gram = factors.T @ factors + self.reg_param * known.sum() * np.eye(rank)
+        return np.linalg.solve(gram, factors.T @ ratings[known])
+
+    def update(self, users, items, ratings):
+        '''
+        Add the ratings (arrays *users*, *items*, *ratings*) and recompute
+        the factors of their users. Return the ids of the updated users.
+        '''
+        users = np.asarray(users)
+        self._add_history(users, np.asarray(items), np.asarray(ratings, dtype=np.float64))
+        updated = np.unique(users).tolist()
+
+        new_users = [user for user in updated if user not in self._user_rows]
+        if new_users:
+            for user in new_users:
+                self._user_rows[user] = len(self.user_ids)
+                self.user_ids.append(user)
+            self.user_factors = np.vstack([self.user_factors,
+                                           np.zeros((len(new_users), self.user_factors.shape[1]))])
+
+        for user in updated:
+            self.user_factors[self._user_rows[user]] = self._solve(user)
+        return updated
+
+    def predict(self, users, items):
+        '''
+        Return the predicted ratings of the (user, item) pairs of the
+        arrays *users* and *items*; NaN when the user or the item has no
+        factors.
+        '''
+        predictions = np.full(len(users), np.nan)
+        for i, (user, item) in enumerate(zip(np.asarray(users).tolist(), np.asarray(items).tolist())):
+            row, col = self._user_rows.get(user), self._item_rows.get(item)
+            if row is not None and col is not None:
+                predictions[i] = self.user_factors[row] @ self.item_factors[col]
+        return predictions
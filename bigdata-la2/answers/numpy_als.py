@@ -0,0 +1,304 @@
+'''
+IN-PROCESS ALS
+
+An alternative to Spark's ALS for datasets that fit on one machine,
+which does not need a Spark session (nor a JVM). The factors are fitted
+by alternating least squares over CSR (by user) and CSC (by item)
+arrays of the training ratings, with the same regularization as Spark's
+explicit ALS: every user (resp. item) solves
+
+    (V_u^T V_u + regParam * n_u * I) x_u = V_u^T r_u
+
+where V_u are the factors of its n_u rated items (resp. raters).
+
+The ratings are processed out of core, CHUNK_RATINGS at a time: they
+are parsed once into .npy files under NUMPY_CACHE_DIR, and the CSR and
+CSC arrays of every split are written to .npy files next to them, all
+read back memory-mapped. Only the ids, the factors and one chunk of
+ratings are held in memory, so the size of the ratings is bounded by
+the disk rather than by the memory.
+
+The training and test sets are an 80%/20% split drawn with NumPy's
+generator seeded with *seed*. It cannot reproduce the split of Spark's
+''DataFrame.randomSplit'', so RMSEs are comparable with the Spark path
+but not identical.
+'''
+import hashlib
+import os
+
+import numpy as np
+
+NUMPY_CACHE_DIR = os.path.join(".cache", "ratings-npy")
+COLUMNS = {"userId": np.int64, "movieId": np.int64, "rating": np.float64}
+COMPRESSED = ["indptr", "indices", "data"]
+
+# Number of ratings parsed, split or compressed at once
+CHUNK_RATINGS = 1000000
+
+# Number of users (or items) whose normal equations are solved at once
+SOLVE_BLOCK = 1024
+
+
+def _parse_chunk(lines):
+    # loadtxt only supports one-character delimiters
+    values = np.loadtxt([line.replace("::", " ") for line in lines], usecols=(0, 1, 2),
+                        dtype=np.float64, ndmin=2)
+    return values[:, 0].astype(np.int64), values[:, 1].astype(np.int64), values[:, 2]
+
+
+def _cache_directory(filename):
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    key = "%s:%d:%d" % (path, stat.st_size, stat.st_mtime_ns)
+    return os.path.join(NUMPY_CACHE_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+
+
+def _write_arrays(files, shapes, fill):
+    # Create the .npy files *files* ({name: path}) of dtypes and lengths
+    # *shapes* ({name: (dtype, length)}), call fill({name: memmap}), and
+    # only then rename them, so that an interrupted build is redone.
+    tmp = {name: files[name] + ".tmp.npy" for name in files}
+    arrays = {name: np.lib.format.open_memmap(tmp[name], mode="w+", dtype=dtype, shape=(length,))
+              for name, (dtype, length) in shapes.items()}
+    fill(arrays)
+    for name, array in arrays.items():
+        array.flush()
+    del arrays
+    for name in files:
+        os.replace(tmp[name], files[name])
+
+
+def _read_arrays(files):
+    return {name: np.load(f, mmap_mode="r") for name, f in files.items()}
+
+
+def load_ratings_arrays(filename):
+    '''
+    Return the dict {'userId', 'movieId', 'rating'} of read-only
+    memory-mapped arrays of the ratings in *filename*. The file is
+    parsed once per (path, size, modification time), CHUNK_RATINGS lines
+    at a time, directly into the memory-mapped files.
+    '''
+    directory = _cache_directory(filename)
+    files = {name: os.path.join(directory, name + ".npy") for name in COLUMNS}
+    if not all(os.path.exists(f) for f in files.values()):
+        os.makedirs(directory, exist_ok=True)
+        with open(filename) as f:
+            # Blank lines are skipped by loadtxt
+            count = sum(1 for line in f if line.strip())
+
+        def fill(arrays):
+            offset = 0
+            with open(filename) as f:
+                while True:
+                    lines = [line for _, line in zip(range(CHUNK_RATINGS), f)]
+                    if not lines:
+                        break
+                    chunk = _parse_chunk(lines)
+                    for name, values in zip(COLUMNS, chunk):
+                        arrays[name][offset:offset + len(values)] = values
+                    offset += len(chunk[0])
+
+        _write_arrays(files, {name: (dtype, count) for name, dtype in COLUMNS.items()}, fill)
+    return _read_arrays(files)
+
+
+def split_chunks(count, seed, train_ratio=0.8):
+    '''
+    Yield, for every chunk of CHUNK_RATINGS of the <count> ratings, the
+    tuple (start, stop, training) where training is the boolean mask of
+    the training ratings of the chunk, in a <train_ratio>/(1 -
+    <train_ratio>) random split with *seed*. The split does not depend
+    on CHUNK_RATINGS.
+    '''
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, CHUNK_RATINGS):
+        stop = min(start + CHUNK_RATINGS, count)
+        yield start, stop, rng.random(stop - start) < train_ratio
+
+
+def _unique(ratings, column, seed):
+    # Sorted ids of the training ratings, one chunk at a time
+    ids = np.empty(0, dtype=np.int64)
+    for start, stop, training in split_chunks(len(ratings[column]), seed):
+        ids = np.union1d(ids, ratings[column][start:stop][training])
+    return ids
+
+
+def _compress(arrays, ratings, seed, row_ids, row_column, col_ids, col_column):
+    # Fill the CSR arrays of the training ratings, with rows row_ids and
+    # columns col_ids, in two passes over the chunks: counts, then
+    # positions. Ratings of a row keep their order in the file.
+    indptr = arrays["indptr"]
+    counts = np.zeros(len(row_ids), dtype=np.int64)
+    for start, stop, training in split_chunks(len(ratings[row_column]), seed):
+        rows = np.searchsorted(row_ids, ratings[row_column][start:stop][training])
+        counts += np.bincount(rows, minlength=len(row_ids))
+    indptr[0] = 0
+    np.cumsum(counts, out=indptr[1:])
+
+    following = np.array(indptr[:-1])
+    for start, stop, training in split_chunks(len(ratings[row_column]), seed):
+        rows = np.searchsorted(row_ids, ratings[row_column][start:stop][training])
+        cols = np.searchsorted(col_ids, ratings[col_column][start:stop][training])
+        values = ratings["rating"][start:stop][training]
+        order = np.argsort(rows, kind="stable")
+        rows = rows[order]
+        # Rank of every rating among the ratings of its row in the chunk
+        firsts = np.searchsorted(rows, rows, side="left")
+        positions = following[rows] + np.arange(len(rows)) - firsts
+        arrays["indices"][positions] = cols[order]
+        arrays["data"][positions] = values[order]
+        following += np.bincount(rows, minlength=len(row_ids))
+
+
+def load_training_arrays(filename, seed):
+    '''
+    Return the tuple (user_ids, by_user, item_ids, by_item) of the
+    training ratings of *filename* split with *seed*: the sorted user
+    and item ids, and the (indptr, indices, data) memory-mapped CSR
+    arrays of the ratings by user row (with item row indices) and by
+    item row (with user row indices). They are written once per file
+    version and seed.
+    '''
+    ratings = load_ratings_arrays(filename)
+    directory = os.path.join(_cache_directory(filename), "seed-%d" % seed)
+    ids = {name: os.path.join(directory, name + ".npy") for name in ["user_ids", "item_ids"]}
+    compressed = {axis: {name: os.path.join(directory, "%s_%s.npy" % (axis, name)) for name in COMPRESSED}
+                  for axis in ["by_user", "by_item"]}
+    if not all(os.path.exists(f) for f in ids.values()):
+        os.makedirs(directory, exist_ok=True)
+        user_ids = _unique(ratings, "userId", seed)
+        item_ids = _unique(ratings, "movieId", seed)
+        size = len(ratings["rating"])
+        count = sum(int(training.sum()) for _, _, training in split_chunks(size, seed))
+        for axis, rows, columns in [("by_user", (user_ids, "userId"), (item_ids, "movieId")),
+                                    ("by_item", (item_ids, "movieId"), (user_ids, "userId"))]:
+            shapes = {"indptr": (np.int64, len(rows[0]) + 1), "indices": (np.int64, count),
+                      "data": (np.float64, count)}
+            _write_arrays(compressed[axis], shapes,
+                          lambda arrays: _compress(arrays, ratings, seed, *rows, *columns))
+
+        # Written last: their presence marks complete arrays
+        def fill(arrays):
+            arrays["user_ids"][:] = user_ids
+            arrays["item_ids"][:] = item_ids
+
+        _write_arrays(ids, {"user_ids": (np.int64, len(user_ids)), "item_ids": (np.int64, len(item_ids))},
+                      fill)
+
+    ids = _read_arrays(ids)
+    by_user = tuple(_read_arrays(compressed["by_user"])[name] for name in COMPRESSED)
+    by_item = tuple(_read_arrays(compressed["by_item"])[name] for name in COMPRESSED)
+    return ids["user_ids"], by_user, ids["item_ids"], by_item
+
+
+def _compressed(rows, cols, values, n_rows):
+    # CSR arrays (indptr, indices, data) of the (rows, cols, values) triples
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], values[order]
+
+
+def _solve(indptr, indices, data, fixed, reg_param):
+    rank = fixed.shape[1]
+    # The row pointers are small: read them once rather than per row
+    indptr = np.array(indptr)
+    solved = np.zeros((len(indptr) - 1, rank))
+    identity = np.eye(rank)
+    for start in range(0, len(indptr) - 1, SOLVE_BLOCK):
+        stop = min(start + SOLVE_BLOCK, len(indptr) - 1)
+        grams = np.empty((stop - start, rank, rank))
+        rhs = np.empty((stop - start, rank))
+        for row in range(start, stop):
+            cols = indices[indptr[row]:indptr[row + 1]]
+            factors = fixed[cols]
+            grams[row - start] = factors.T @ factors + reg_param * len(cols) * identity
+            rhs[row - start] = factors.T @ data[indptr[row]:indptr[row + 1]]
+        # Rows without ratings have a zero right-hand side: solving the
+        # regularized (or identity) system keeps their factors at zero.
+        empty = indptr[start + 1:stop + 1] == indptr[start:stop]
+        grams[empty] = identity
+        solved[start:stop] = np.linalg.solve(grams, rhs[..., np.newaxis])[..., 0]
+    return solved
+
+
+class NumpyALS:
+    '''
+    Explicit ALS with the parameters of pyspark.ml.recommendation.ALS
+    (rank, maxIter, regParam, seed).
+    '''
+
+    def __init__(self, rank=10, maxIter=10, regParam=0.1, seed=0):
+        self.rank = rank
+        self.maxIter = maxIter
+        self.regParam = regParam
+        self.seed = seed
+
+    def fit(self, users, items, ratings):
+        '''
+        Fit the factors on the arrays *users*, *items* and *ratings*, and
+        return self.
+        '''
+        user_ids, user_rows = np.unique(users, return_inverse=True)
+        item_ids, item_rows = np.unique(items, return_inverse=True)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        by_user = _compressed(user_rows, item_rows, ratings, len(user_ids))
+        by_item = _compressed(item_rows, user_rows, ratings, len(item_ids))
+        return self.fit_compressed(user_ids, by_user, item_ids, by_item)
+
+    def fit_compressed(self, user_ids, by_user, item_ids, by_item):
+        '''
+        Fit the factors on the sorted *user_ids* and *item_ids* and the
+        (indptr, indices, data) CSR arrays of the ratings *by_user* and
+        *by_item* (as returned by load_training_arrays, or in memory),
+        and return self.
+        '''
+        self.user_ids = np.asarray(user_ids)
+        self.item_ids = np.asarray(item_ids)
+
+        # Random unit vectors, as Spark initializes the factors
+        rng = np.random.default_rng(self.seed)
+        self.item_factors = rng.normal(size=(len(self.item_ids), self.rank))
+        self.item_factors /= np.linalg.norm(self.item_factors, axis=1, keepdims=True)
+        for _ in range(self.maxIter):
+            self.user_factors = _solve(*by_user, self.item_factors, self.regParam)
+            self.item_factors = _solve(*by_item, self.user_factors, self.regParam)
+        return self
+
+    def predict(self, users, items):
+        '''
+        Return the predicted ratings of the (user, item) pairs of the
+        arrays *users* and *items*; NaN when the user or the item was not
+        in the training ratings.
+        '''
+        user_pos = np.searchsorted(self.user_ids, users).clip(max=len(self.user_ids) - 1)
+        item_pos = np.searchsorted(self.item_ids, items).clip(max=len(self.item_ids) - 1)
+        known = (self.user_ids[user_pos] == users) & (self.item_ids[item_pos] == items)
+        predictions = np.full(len(users), np.nan)
+        predictions[known] = np.einsum("ij,ij->i", self.user_factors[user_pos[known]],
+                                       self.item_factors[item_pos[known]])
+        return predictions
+
+
+def numpy_als_rmse(filename, seed, rank=70, maxIter=5, regParam=0.01):
+    '''
+    Return the RMSE on the test set of an explicit ALS model fitted with
+    NumpyALS on the training set of *filename* split with *seed*. Test
+    ratings of users or items absent from the training set are dropped,
+    as with coldStartStrategy='drop'.
+    '''
+    model = NumpyALS(rank=rank, maxIter=maxIter, regParam=regParam, seed=seed)
+    model.fit_compressed(*load_training_arrays(filename, seed))
+
+    ratings = load_ratings_arrays(filename)
+    squared_errors = 0.0
+    count = 0
+    for start, stop, training in split_chunks(len(ratings["rating"]), seed):
+        test = ~training
+        predictions = model.predict(ratings["userId"][start:stop][test], ratings["movieId"][start:stop][test])
+        known = ~np.isnan(predictions)
+        squared_errors += np.sum((predictions[known] - ratings["rating"][start:stop][test][known]) ** 2)
+        count += int(known.sum())
+    return float(np.sqrt(squared_errors / count))
@@ -0,0 +1,141 @@
+'''
+TOP-K RECOMMENDATIONS
+
+Serving of recommendations from a fitted ALS model without Spark: the
+user and item factor matrices are exported once to NumPy arrays, and
+the top-K movies of a user are the K items with the largest dot
+product between the user factors and the item factors, excluding the
+items already rated by the user.
+
+Batches of users are scored with one matrix multiplication per block of
+users, and the K best items of each user are selected with
+np.argpartition, so that only K scores per user are fully sorted.
+'''
+import numpy as np
+
+
+def export_factors(model):
+    '''
+    Return the tuple (user_ids, user_factors, item_ids, item_factors) of
+    NumPy arrays holding the factors of the fitted ALS *model*. Factor
+    rows are ordered as the corresponding ids, in ascending order.
+    '''
+    def to_arrays(factors):
+        rows = factors.orderBy("id").collect()
+        ids = np.array([row["id"] for row in rows], dtype=np.int64)
+        values = np.array([row["features"] for row in rows], dtype=np.float32)
+        return ids, values.reshape(len(rows), model.rank)
+
+    user_ids, user_factors = to_arrays(model.userFactors)
+    item_ids, item_factors = to_arrays(model.itemFactors)
+    return user_ids, user_factors, item_ids, item_factors
+
+
+def rating_arrays(ratings, rating_col="rating"):
+    '''
+    Return the (userId, movieId, <rating_col>) columns of the ratings
+    DataFrame *ratings* as three aligned NumPy arrays, collected with a
+    single action (two actions may not return the rows in the same
+    order, e.g. after a join).
+    '''
+    rows = ratings.select("userId", "movieId", rating_col).collect()
+    users = np.array([row[0] for row in rows], dtype=np.int64)
+    items = np.array([row[1] for row in rows], dtype=np.int64)
+    values = np.array([row[2] for row in rows], dtype=np.float64)
+    return users, items, values
+
+
+class TopKRecommender:
+    '''
+    Local top-K recommender over exported ALS factors.
+
+    *rated_users* and *rated_items* are optional arrays of (user id, item
+    id) pairs, typically the training ratings, whose items are never
+    recommended to the corresponding users. Pairs whose user or item has
+    no factors are ignored.
+    '''
+
+    def __init__(self, user_ids, user_factors, item_ids, item_factors,
+                 rated_users=None, rated_items=None, block_size=256):
+        self.user_ids = np.asarray(user_ids)
+        self.user_factors = np.ascontiguousarray(user_factors, dtype=np.float32)
+        self.item_ids = np.asarray(item_ids)
+        self.item_factors = np.ascontiguousarray(item_factors, dtype=np.float32)
+        self.block_size = block_size
+        self._user_rows = {user: row for row, user in enumerate(self.user_ids.tolist())}
+
+        # Rated items as a CSR structure over user rows: the item columns
+        # rated by user row u are rated_cols[rated_ptr[u]:rated_ptr[u+1]].
+        rows = np.empty(0, dtype=np.int64)
+        cols = np.empty(0, dtype=np.int64)
+        if rated_users is not None:
+            rows, cols = self._positions(np.asarray(rated_users), np.asarray(rated_items))
+        order = np.argsort(rows, kind="stable")
+        self.rated_cols = cols[order]
+        self.rated_ptr = np.zeros(len(self.user_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.user_ids)), out=self.rated_ptr[1:])
+
+    @classmethod
+    def from_model(cls, model, ratings=None, **kwargs):
+        '''
+        Build a recommender from the fitted ALS *model*, excluding the
+        items of the ratings DataFrame *ratings* if given.
+        '''
+        factors = export_factors(model)
+        rated = rating_arrays(ratings)[:2] if ratings is not None else (None, None)
+        return cls(*factors, rated_users=rated[0], rated_items=rated[1], **kwargs)
+
+    def _positions(self, users, items):
+        # Map ids to factor rows; ids are sorted by export_factors, but
+        # user-supplied arrays may not be.
+        user_order = np.argsort(self.user_ids)
+        item_order = np.argsort(self.item_ids)
+        u = np.searchsorted(self.user_ids, users, sorter=user_order)
+        i = np.searchsorted(self.item_ids, items, sorter=item_order)
+        rows = user_order[np.minimum(u, len(self.user_ids) - 1)]
+        cols = item_order[np.minimum(i, len(self.item_ids) - 1)]
+        known = (self.user_ids[rows] == users) & (self.item_ids[cols] == items)
+        return rows[known], cols[known]
+
+    def _top_k(self, rows, k):
+        scores = self.user_factors[rows] @ self.item_factors.T
+        starts = self.rated_ptr[rows]
+        counts = self.rated_ptr[rows + 1] - starts
+        if counts.sum():
+            # Positions of the rated items of every user of the block
+            block_rows = np.repeat(np.arange(len(rows)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            scores[block_rows, self.rated_cols[np.repeat(starts, counts) + offsets]] = -np.inf
+
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return (np.take_along_axis(best, order, axis=1),
+                np.take_along_axis(best_scores, order, axis=1))
+
+    def recommend(self, user_id, k=10):
+        '''
+        Return the tuple (item_ids, scores) of the <k> best items for
+        user *user_id*, by descending score. Raise KeyError if the user
+        has no factors.
+        '''
+        items, scores = self.recommend_batch([user_id], k)
+        return items[0], scores[0]
+
+    def recommend_batch(self, user_ids, k=10):
+        '''
+        Return the tuple (item_ids, scores) of 2D arrays holding, for
+        every user of *user_ids*, its <k> best items by descending score.
+        When a user has rated all but fewer than <k> items, its last
+        recommendations have a score of -inf.
+        '''
+        rows = np.array([self._user_rows[user] for user in user_ids], dtype=np.int64)
+        k = min(k, len(self.item_ids))
+        items = np.empty((len(rows), k), dtype=self.item_ids.dtype)
+        scores = np.empty((len(rows), k), dtype=np.float32)
+        for start in range(0, len(rows), self.block_size):
+            block = slice(start, start + self.block_size)
+            best, best_scores = self._top_k(rows[block], k)
+            items[block] = self.item_ids[best]
+            scores[block] = best_scores
+        return items, scores
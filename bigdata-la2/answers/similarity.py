@@ -0,0 +1,98 @@
+'''
+SIMILAR MOVIES
+
+Approximate nearest-neighbor search of the movies most similar to a
+movie, by cosine similarity of their ALS item factors.
+
+The index is a random-projection LSH: every table hashes the normalized
+item factors to the signs of <n_bits> random projections, so that items
+with a small angle between them are likely to share a bucket. A query
+gathers the items of its bucket in each of the <n_tables> tables (and,
+with probe_radius=1, of the buckets differing by one bit), then ranks
+these candidates by exact cosine similarity. More tables and probes
+increase recall, more bits reduce the number of candidates and the
+latency.
+'''
+import numpy as np
+
+from answers.serving import export_factors
+
+
+class ItemSimilarityIndex:
+    '''
+    Random-projection LSH index over item factors.
+    '''
+
+    def __init__(self, item_ids, item_factors, n_tables=8, n_bits=12, probe_radius=0, seed=0):
+        if not 0 <= probe_radius <= 1:
+            raise ValueError("probe_radius must be 0 or 1")
+        self.item_ids = np.asarray(item_ids)
+        factors = np.asarray(item_factors, dtype=np.float32)
+        norms = np.linalg.norm(factors, axis=1, keepdims=True)
+        self.vectors = np.divide(factors, norms, out=np.zeros_like(factors), where=norms > 0)
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probe_radius = probe_radius
+        self._rows = {item: row for row, item in enumerate(self.item_ids.tolist())}
+
+        rng = np.random.default_rng(seed)
+        self._planes = rng.normal(size=(n_tables, factors.shape[1], n_bits)).astype(np.float32)
+        self._weights = np.left_shift(1, np.arange(n_bits, dtype=np.int64))
+
+        # Buckets of table t: items self._order[:, t], sorted by code
+        codes = self._codes(self.vectors)
+        self._order = np.argsort(codes, axis=0, kind="stable")
+        self._sorted_codes = np.take_along_axis(codes, self._order, axis=0)
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        '''
+        Build an index over the item factors of the fitted ALS *model*.
+        '''
+        user_ids, user_factors, item_ids, item_factors = export_factors(model)
+        return cls(item_ids, item_factors, **kwargs)
+
+    def _codes(self, vectors):
+        # (n, n_tables) bucket codes: one bit per projection sign
+        bits = np.einsum("nr,trb->ntb", vectors, self._planes) > 0
+        return bits.astype(np.int64) @ self._weights
+
+    def candidates(self, vector):
+        '''
+        Return the rows of the items sharing a bucket with *vector*.
+        '''
+        codes = self._codes(vector[np.newaxis])[0]
+        probes = codes[:, np.newaxis]
+        if self.probe_radius:
+            probes = np.hstack([probes, codes[:, np.newaxis] ^ self._weights])
+        found = []
+        for table in range(self.n_tables):
+            sorted_codes = self._sorted_codes[:, table]
+            starts = np.searchsorted(sorted_codes, probes[table], side="left")
+            ends = np.searchsorted(sorted_codes, probes[table], side="right")
+            found.extend(self._order[start:end, table] for start, end in zip(starts, ends))
+        return np.unique(np.concatenate(found))
+
+    def _rank(self, row, rows, k):
+        rows = rows[rows != row]
+        scores = self.vectors[rows] @ self.vectors[row]
+        k = min(k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k] if k else np.empty(0, dtype=np.int64)
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return self.item_ids[rows[best]], scores[best]
+
+    def similar(self, item_id, k=10):
+        '''
+        Return the tuple (item_ids, similarities) of the (at most) <k>
+        items most similar to *item_id* among its LSH candidates, by
+        descending cosine similarity. Raise KeyError for unknown items.
+        '''
+        row = self._rows[item_id]
+        return self._rank(row, self.candidates(self.vectors[row]), k)
+
+    def similar_exact(self, item_id, k=10):
+        '''
+        Same as *similar*, by brute force over all the items.
+        '''
+        row = self._rows[item_id]
+        return self._rank(row, np.arange(len(self.item_ids)), k)
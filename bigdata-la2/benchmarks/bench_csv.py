@@ -0,0 +1,59 @@
+'''
+Compare the original reduce-based CSV helper with
+answers.answer.toCSVLine on a DataFrame of --rows synthetic ratings,
+both to a string and (for toCSVLine) streamed to a file. Run from the
+assignment directory:
+
+    python -m benchmarks.bench_csv --rows 1000000
+'''
+import argparse
+import os
+import tempfile
+import time
+
+from pyspark.sql.functions import col, rand
+
+from answers.answer import init_spark, toCSVLine
+
+
+def toCSVLine_reduce(data):
+    a = data.rdd.map(lambda row: ",".join([str(elt) for elt in row]))\
+           .reduce(lambda x,y: '\n'.join([x,y]))
+    return a + '\n'
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--skip-reduce", action="store_true",
+                        help="do not run the (quadratic) original helper")
+    args = parser.parse_args()
+
+    spark = init_spark()
+    data = spark.range(args.rows).select(col("id").alias("userId"), (col("id") % 1000).alias("movieId"),
+                                         (rand(0) * 5).alias("rating")).persist()
+    data.count()
+
+    expected, seconds = timed(toCSVLine, data)
+    print("toCSVLine (string)  %.2f s" % seconds)
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "out.csv"), "w") as out:
+            result, seconds = timed(toCSVLine, data, out)
+        print("toCSVLine (file)    %.2f s" % seconds)
+        with open(os.path.join(tmp, "out.csv")) as f:
+            assert f.read() == expected
+    if not args.skip_reduce:
+        result, seconds = timed(toCSVLine_reduce, data)
+        print("reduce (string)     %.2f s" % seconds)
+        # The reduce-based helper does not guarantee the order of the lines
+        assert sorted(result.splitlines()) == sorted(expected.splitlines())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+'''
+Compare the two engines of answers.answer.basic_als_recommender: wall
+time (including the Spark session startup) and peak resident memory
+(of the Python process and, for Spark, of its JVM). Every engine runs
+in a fresh process, twice: the first run also parses the ratings file
+into its cache. Run from the assignment directory:
+
+    python -m benchmarks.bench_engines --ratings data/sample_movielens_ratings.txt
+'''
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+
+def peak_rss_mb(pid="self"):
+    # VmHWM: peak resident set size of the process, in kB
+    with open("/proc/%s/status" % pid) as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_engine(engine, filename, seed, runs):
+    from answers.answer import basic_als_recommender
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rmse = basic_als_recommender(filename, seed, engine=engine)
+        timings.append(time.perf_counter() - start)
+    rss = peak_rss_mb()
+    if engine == "spark":
+        from answers.answer import init_spark
+        rss += peak_rss_mb(init_spark().sparkContext._gateway.proc.pid)
+    print(json.dumps({"rmse": rmse, "seconds": timings, "rss_mb": rss}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ratings", default="data/sample_movielens_ratings.txt")
+    parser.add_argument("--seed", type=int, default=123)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        run_engine(args.engine, args.ratings, args.seed, args.runs)
+        return
+
+    for engine in ["numpy", "spark"]:
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_engines",
+                                 "--engine", engine, "--ratings", args.ratings,
+                                 "--seed", str(args.seed), "--runs", str(args.runs)],
+                                check=True, capture_output=True, text=True).stdout
+        total = time.perf_counter() - start
+        result = json.loads(output.strip().splitlines()[-1])
+        print("%-6s rmse %.4f  runs %s s  process %.2f s  peak rss %.0f MB"
+              % (engine, result["rmse"], " ".join("%.2f" % t for t in result["seconds"]),
+                 total, result["rss_mb"]))
+
+
+if __name__ == "__main__":
+    main()
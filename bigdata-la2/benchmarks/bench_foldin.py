@@ -0,0 +1,63 @@
+'''
+Compare the latency of folding a batch of new ratings into a fitted ALS
+model (answers.foldin.FoldInALS plus BaselineBias.update) with a full
+retraining (ALS and BaselineBias fitted again on all the ratings).
+
+Half of the test set of the given file is used as the batch of new
+ratings, the other half to report the RMSE of both models. Run from the
+assignment directory:
+
+    python -m benchmarks.bench_foldin --ratings data/sample_movielens_ratings.txt
+'''
+import argparse
+import time
+
+import numpy as np
+from pyspark.ml.recommendation import ALS
+
+from answers.answer import BaselineBias, load_ratings
+from answers.foldin import FoldInALS, rating_arrays
+
+
+def rmse(model, users, items, ratings):
+    predictions = model.predict(users, items)
+    known = ~np.isnan(predictions)
+    return np.sqrt(np.mean((predictions[known] - ratings[known]) ** 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ratings", default="data/sample_movielens_ratings.txt")
+    parser.add_argument("--seed", type=int, default=123)
+    parser.add_argument("--rank", type=int, default=70)
+    parser.add_argument("--reg-param", type=float, default=0.01)
+    args = parser.parse_args()
+
+    ratings, training, test = load_ratings(args.ratings, args.seed)
+    batch, holdout = test.randomSplit([0.5, 0.5], args.seed)
+    batch, holdout = batch.persist(), holdout.persist()
+    holdout_arrays = rating_arrays(holdout)
+    als = ALS(maxIter=5, rank=args.rank, regParam=args.reg_param, userCol="userId",
+              itemCol="movieId", ratingCol="rating", coldStartStrategy="drop", seed=args.seed)
+
+    model = FoldInALS.from_model(als.fit(training), training, args.reg_param)
+    bias = BaselineBias().fit(training)
+    batch_arrays = rating_arrays(batch)
+    start = time.perf_counter()
+    model.update(*batch_arrays)
+    bias.update(batch)
+    fold_in = time.perf_counter() - start
+    print("fold-in: %.3f s  rmse %.4f" % (fold_in, rmse(model, *holdout_arrays)))
+
+    start = time.perf_counter()
+    everything = training.unionByName(batch)
+    retrained = als.fit(everything)
+    BaselineBias().fit(everything)
+    retrain = time.perf_counter() - start
+    retrained = FoldInALS.from_model(retrained, everything, args.reg_param)
+    print("retrain: %.3f s  rmse %.4f" % (retrain, rmse(retrained, *holdout_arrays)))
+    print("speedup: %.1fx" % (retrain / fold_in))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+'''
+Compare the throughput of the two ways of parsing a MovieLens ratings
+file:
+- rdd: the original parsing, splitting every line in a Python lambda
+  and building Row objects before calling createDataFrame;
+- native: answers.answer.parse_ratings, using split/cast expressions.
+
+The ratings file is synthetic. Run from the assignment directory:
+
+    python -m benchmarks.bench_ingest --rows 10000000
+'''
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from pyspark.sql import Row
+
+from answers.answer import init_spark, parse_ratings
+
+
+def write_synthetic_ratings(filename, rows, seed=0, chunk=1000000):
+    rng = np.random.default_rng(seed)
+    with open(filename, "w") as f:
+        for start in range(0, rows, chunk):
+            size = min(chunk, rows - start)
+            users = rng.integers(0, 160000, size)
+            movies = rng.integers(0, 60000, size)
+            ratings = rng.integers(1, 11, size) / 2
+            timestamps = rng.integers(789652009, 1574327703, size)
+            f.writelines("%d::%d::%.1f::%d\n" % row
+                         for row in zip(users, movies, ratings, timestamps))
+
+
+def parse_ratings_rdd(spark, filename):
+    lines = spark.read.text(filename).rdd
+    parts = lines.map(lambda row: row.value.split("::"))
+    ratingsRDD = parts.map(lambda p: Row(userId=int(p[0]), movieId=int(p[1]),
+                                         rating=float(p[2]), timestamp=int(p[3])))
+    return spark.createDataFrame(ratingsRDD)
+
+
+def throughput(parse, spark, filename, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # The noop sink materializes every column without writing anything
+        parse(spark, filename).write.format("noop").mode("overwrite").save()
+        best = min(best, time.perf_counter() - start)
+    return rows / best, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", help="reuse or create this ratings file")
+    args = parser.parse_args()
+
+    spark = init_spark()
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = args.file or os.path.join(tmp, "ratings.txt")
+        if not os.path.exists(filename):
+            write_synthetic_ratings(filename, args.rows)
+        for name, parse in [("rdd", parse_ratings_rdd), ("native", parse_ratings)]:
+            rate, seconds = throughput(parse, spark, filename, args.rows, args.repeat)
+            print("%-8s %12.0f rows/s  (%.2f s)" % (name, rate, seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+'''
+Measure the latency of answers.serving.TopKRecommender: p50/p99 latency
+of single-user queries, and throughput of batch queries.
+
+By default the factors are random, with MovieLens-like sizes. With
+--ratings, an ALS model is fitted with Spark on the training set of the
+given file and served instead. Run from the assignment directory:
+
+    python -m benchmarks.bench_serving --users 160000 --items 60000
+'''
+import argparse
+import time
+
+import numpy as np
+
+from answers.serving import TopKRecommender
+
+
+def synthetic_recommender(users, items, rank, ratings_per_user, block_size, seed=0):
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(size=(users, rank)).astype(np.float32)
+    item_factors = rng.normal(size=(items, rank)).astype(np.float32)
+    rated_users = np.repeat(np.arange(users), ratings_per_user)
+    rated_items = rng.integers(0, items, users * ratings_per_user)
+    return TopKRecommender(np.arange(users), user_factors, np.arange(items), item_factors,
+                           rated_users, rated_items, block_size=block_size)
+
+
+def spark_recommender(filename, seed, block_size):
+    from pyspark.ml.recommendation import ALS
+    from answers.answer import load_ratings
+
+    ratings, training, test = load_ratings(filename, seed)
+    als = ALS(maxIter=5, rank=70, regParam=0.01, userCol="userId", itemCol="movieId",
+              ratingCol="rating", coldStartStrategy="drop", seed=seed)
+    return TopKRecommender.from_model(als.fit(training), training, block_size=block_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--rank", type=int, default=70)
+    parser.add_argument("--ratings-per-user", type=int, default=100)
+    parser.add_argument("--ratings", help="fit the model on this MovieLens file")
+    parser.add_argument("--seed", type=int, default=123)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--block-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.ratings:
+        recommender = spark_recommender(args.ratings, args.seed, args.block_size)
+    else:
+        recommender = synthetic_recommender(args.users, args.items, args.rank,
+                                            args.ratings_per_user, args.block_size)
+    users = np.random.default_rng(args.seed).choice(recommender.user_ids, args.queries)
+
+    latencies = []
+    for user in users:
+        start = time.perf_counter()
+        recommender.recommend(user, args.k)
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print("single query: p50 %.3f ms  p99 %.3f ms" % (p50, p99))
+
+    start = time.perf_counter()
+    recommender.recommend_batch(users, args.k)
+    seconds = time.perf_counter() - start
+    print("batch: %d users in %.3f s (%.0f users/s)" % (len(users), seconds, len(users) / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+'''
+Compare answers.similarity.ItemSimilarityIndex with exact brute-force
+cosine search: recall@k of the approximate neighbors, and p50/p99 query
+latency, for several (n_tables, n_bits, probe_radius) settings.
+
+By default the item factors are random. With --ratings, an ALS model is
+fitted with Spark on the training set of the given file and its item
+factors are indexed instead. Run from the assignment directory:
+
+    python -m benchmarks.bench_similarity --items 60000
+'''
+import argparse
+import time
+
+import numpy as np
+
+from answers.similarity import ItemSimilarityIndex
+
+SETTINGS = [(4, 14, 0), (8, 14, 0), (8, 12, 0), (16, 12, 0), (8, 14, 1), (16, 16, 1)]
+
+
+def item_factors(args):
+    if not args.ratings:
+        rng = np.random.default_rng(0)
+        # Clustered factors, closer to real item factors than pure noise
+        centers = rng.normal(size=(100, args.rank))
+        return (np.arange(args.items),
+                centers[rng.integers(0, 100, args.items)] + 0.5 * rng.normal(size=(args.items, args.rank)))
+
+    from pyspark.ml.recommendation import ALS
+    from answers.answer import load_ratings
+    from answers.serving import export_factors
+
+    ratings, training, test = load_ratings(args.ratings, args.seed)
+    als = ALS(maxIter=5, rank=args.rank, regParam=0.01, userCol="userId", itemCol="movieId",
+              ratingCol="rating", coldStartStrategy="drop", seed=args.seed)
+    user_ids, user_factors, item_ids, factors = export_factors(als.fit(training))
+    return item_ids, factors
+
+
+def timed(query, items, k):
+    results, latencies = [], []
+    for item in items:
+        start = time.perf_counter()
+        results.append(query(item, k)[0])
+        latencies.append(time.perf_counter() - start)
+    return results, np.percentile(latencies, [50, 99]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--rank", type=int, default=70)
+    parser.add_argument("--ratings", help="fit the model on this MovieLens file")
+    parser.add_argument("--seed", type=int, default=123)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    item_ids, factors = item_factors(args)
+    queries = np.random.default_rng(args.seed).choice(item_ids, args.queries)
+
+    exact_index = ItemSimilarityIndex(item_ids, factors, n_tables=1, n_bits=1)
+    exact, (p50, p99) = timed(exact_index.similar_exact, queries, args.k)
+    print("%-22s recall@%d 1.000  p50 %8.3f ms  p99 %8.3f ms" % ("exact", args.k, p50, p99))
+
+    for n_tables, n_bits, probe_radius in SETTINGS:
+        start = time.perf_counter()
+        index = ItemSimilarityIndex(item_ids, factors, n_tables, n_bits, probe_radius, seed=args.seed)
+        build = time.perf_counter() - start
+        found, (p50, p99) = timed(index.similar, queries, args.k)
+        recall = np.mean([len(np.intersect1d(a, b)) / max(len(b), 1) for a, b in zip(found, exact)])
+        name = "lsh t=%d b=%d p=%d" % (n_tables, n_bits, probe_radius)
+        print("%-22s recall@%d %.3f  p50 %8.3f ms  p99 %8.3f ms  build %.2f s"
+              % (name, args.k, recall, p50, p99, build))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+
+from answers.answer import als_grid, als_search
+
+
+def test_als_search():
+    configs = als_grid({"rank": [70], "regParam": [0.01, 0.1], "maxIter": [5],
+                        "implicitPrefs": [False]})
+    assert len(configs) == 2
+    a = als_search(
+        os.path.join(".", "data", "sample_movielens_ratings.txt"), 123, configs, 2
+    )
+    assert len(a) == 2
+    assert a[0]["rmse"] <= a[1]["rmse"]
+    basic = [row for row in a if row["regParam"] == 0.01][0]
+    try:
+        assert abs(basic["rmse"] - 1.62) < 0.03
+    except:
+        assert abs(basic["rmse"] - 1.56) < 0.03
+    assert basic["fit_seconds"] > 0
@@ -0,0 +1,42 @@
+import os
+
+from answers.answer import BaselineBias, load_ratings
+
+
+def test_baseline_bias():
+    ratings, training, test = load_ratings(
+        os.path.join(".", "data", "sample_movielens_ratings.txt"), 123
+    )
+    bias = BaselineBias().fit(training)
+    assert abs(bias.global_mean - 1.77491694352) < 0.01
+    user_counts = {r["userId"]: r["count"] for r in training.groupBy("userId").count().collect()}
+    fitted = {r["userId"]: r["user_count"] for r in bias.user_means.collect()}
+    assert fitted == user_counts
+    attached = bias.transform(test)
+    assert attached.count() == test.count()
+    assert "baseline" in attached.columns
+
+
+def test_baseline_bias_join_strategy():
+    ratings, training, test = load_ratings(
+        os.path.join(".", "data", "sample_movielens_ratings.txt"), 123
+    )
+    bias = BaselineBias().fit(training)
+    assert bias.join_strategy == {"user": "broadcast", "item": "broadcast"}
+    shuffled = BaselineBias(broadcast_threshold=-1).fit(training)
+    assert shuffled.join_strategy == {"user": "shuffle_hash", "item": "shuffle_hash"}
+    assert sorted(shuffled.transform(test).collect()) == sorted(bias.transform(test).collect())
+
+
+def test_baseline_bias_update_lineage():
+    ratings, training, test = load_ratings(
+        os.path.join(".", "data", "sample_movielens_ratings.txt"), 123
+    )
+    bias = BaselineBias().fit(training)
+    for batch in test.randomSplit([1.0] * 5, 0):
+        bias.update(batch)
+    # The statistics do not keep the unions of the previous updates
+    assert "Union" not in bias._stats._jdf.queryExecution().analyzed().toString()
+    user_counts = {r["userId"]: r["count"] for r in ratings.groupBy("userId").count().collect()}
+    assert {r["userId"]: r["user_count"] for r in bias.user_means.collect()} == user_counts
+    bias.unpersist()
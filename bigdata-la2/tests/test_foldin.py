@@ -0,0 +1,33 @@
+import numpy as np
+
+from answers.foldin import FoldInALS
+
+
+def least_squares(item_factors, ratings, reg_param):
+    gram = item_factors.T @ item_factors + reg_param * len(ratings) * np.eye(item_factors.shape[1])
+    return np.linalg.solve(gram, item_factors.T @ ratings)
+
+
+def test_fold_in():
+    rng = np.random.default_rng(0)
+    items = rng.normal(size=(50, 5))
+    users = rng.normal(size=(10, 5))
+    rated_users = np.repeat(np.arange(10), 8)
+    rated_items = rng.integers(0, 50, 80)
+    ratings = rng.integers(1, 6, 80).astype(float)
+    model = FoldInALS(np.arange(10), users, np.arange(50), items, 0.1,
+                      rated_users, rated_items, ratings)
+
+    # Existing user 3 and new user 42; item 99 is unknown to the model
+    updated = model.update([3, 3, 42, 42, 42], [1, 2, 5, 6, 99], [5.0, 4.0, 1.0, 2.0, 3.0])
+    assert updated == [3, 42]
+
+    history = rated_users == 3
+    expected = least_squares(items[np.append(rated_items[history], [1, 2])],
+                             np.append(ratings[history], [5.0, 4.0]), 0.1)
+    assert np.allclose(model.predict([3], [7]), expected @ items[7])
+    expected = least_squares(items[[5, 6]], np.array([1.0, 2.0]), 0.1)
+    assert np.allclose(model.predict([42], [7]), expected @ items[7])
+    # Other users are left untouched
+    assert np.allclose(model.predict([4], [7]), users[4] @ items[7])
+    assert np.isnan(model.predict([42], [99])[0])
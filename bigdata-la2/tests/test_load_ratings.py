@@ -0,0 +1,14 @@
+import os
+
+from answers.answer import load_ratings, ratings_dataset_path, SOURCE_HASH_FILE
+
+
+def test_load_ratings():
+    filename = os.path.join(".", "data", "sample_movielens_ratings.txt")
+    ratings, training, test = load_ratings(filename, 123)
+    assert ratings.columns == ["userId", "movieId", "rating", "timestamp"]
+    assert training.count() + test.count() == ratings.count() == 1501
+    # The split is parsed and sampled only once per (file, seed)
+    assert load_ratings(filename, 123)[1] is training
+    dataset = ratings_dataset_path(filename, 123)
+    assert os.path.exists(os.path.join(dataset, SOURCE_HASH_FILE))
@@ -0,0 +1,25 @@
+import os
+
+from answers.answer import monitor_ratings_stream
+
+
+def test_monitor_ratings_stream(tmp_path):
+    lines = open(os.path.join(".", "data", "sample_movielens_ratings.txt")).readlines()
+    directory = tmp_path / "ratings"
+    directory.mkdir()
+    (directory / "part-0.txt").write_text("".join(lines[:1000]))
+    (directory / "part-1.txt").write_text("".join(lines[1000:]))
+
+    batches = []
+    query = monitor_ratings_stream(str(directory), batches.append, max_files_per_trigger=1,
+                                   checkpoint=str(tmp_path / "checkpoint"))
+    try:
+        query.processAllAvailable()
+    finally:
+        query.stop()
+
+    assert sorted(batch["count"] for batch in batches) == [501, 1000]
+    assert batches[0]["global_rmse"] is None
+    assert batches[1]["bias_rmse"] > 0
+    ratings = [float(line.split("::")[2]) for line in lines]
+    assert abs(batches[1]["global_mean"] - sum(ratings) / len(ratings)) < 1e-9
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+
+from answers import numpy_als
+from answers.numpy_als import NumpyALS, numpy_als_rmse
+
+
+def test_numpy_als_low_rank():
+    rng = np.random.default_rng(0)
+    users = rng.normal(size=(40, 3))
+    items = rng.normal(size=(30, 3))
+    pairs = np.array([(u, i) for u in range(40) for i in range(30)])
+    ratings = np.einsum("ij,ij->i", users[pairs[:, 0]], items[pairs[:, 1]])
+    model = NumpyALS(rank=3, maxIter=20, regParam=1e-6, seed=1)
+    model.fit(pairs[:, 0] + 100, pairs[:, 1], ratings)
+    assert np.allclose(model.predict(pairs[:, 0] + 100, pairs[:, 1]), ratings, atol=1e-2)
+    assert np.isnan(model.predict(np.array([0]), np.array([0]))[0])
+
+
+def test_numpy_als_rmse():
+    a = numpy_als_rmse(os.path.join(".", "data", "sample_movielens_ratings.txt"), 123)
+    assert 0.5 < a < 2.0
+
+
+def test_load_training_arrays(tmp_path, monkeypatch):
+    # Several chunks, written out of core, give the in-memory arrays
+    monkeypatch.setattr(numpy_als, "NUMPY_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(numpy_als, "CHUNK_RATINGS", 400)
+    filename = os.path.join(".", "data", "sample_movielens_ratings.txt")
+    user_ids, by_user, item_ids, by_item = numpy_als.load_training_arrays(filename, 123)
+
+    ratings = numpy_als.load_ratings_arrays(filename)
+    training = np.random.default_rng(123).random(len(ratings["rating"])) < 0.8
+    users, items = ratings["userId"][training], ratings["movieId"][training]
+    assert (user_ids == np.unique(users)).all()
+    assert (item_ids == np.unique(items)).all()
+    user_rows, item_rows = np.searchsorted(user_ids, users), np.searchsorted(item_ids, items)
+    for compressed, expected in [(by_user, numpy_als._compressed(user_rows, item_rows, ratings["rating"][training],
+                                                                 len(user_ids))),
+                                 (by_item, numpy_als._compressed(item_rows, user_rows, ratings["rating"][training],
+                                                                 len(item_ids)))]:
+        for array, expected_array in zip(compressed, expected):
+            assert isinstance(array, np.memmap)
+            assert (array == expected_array).all()
@@ -0,0 +1,15 @@
+from answers.answer import init_spark
+from answers.foldin import rating_arrays
+
+
+def test_rating_arrays():
+    spark = init_spark()
+    ratings = spark.createDataFrame([(u, u * 10 + 1, float(u)) for u in range(50)],
+                                    ["userId", "movieId", "rating"])
+    biases = spark.createDataFrame([(u, 0.5) for u in range(50)], ["userId", "bias"])
+    # Row order after a shuffle join is arbitrary: the columns must stay aligned
+    joined = ratings.repartition(7).join(biases, "userId") \
+        .withColumn("rating_biased", ratings.rating - biases.bias)
+    users, items, values = rating_arrays(joined, "rating_biased")
+    assert (items == users * 10 + 1).all()
+    assert (values == users - 0.5).all()
@@ -0,0 +1,27 @@
+import numpy as np
+
+from answers.serving import TopKRecommender
+
+
+def test_top_k_recommender():
+    rng = np.random.default_rng(0)
+    user_ids = np.arange(0, 40, 2)
+    item_ids = np.arange(100, 400, 3)
+    users = rng.normal(size=(len(user_ids), 8)).astype(np.float32)
+    items = rng.normal(size=(len(item_ids), 8)).astype(np.float32)
+    rated_users = rng.choice(user_ids, 300)
+    rated_items = rng.choice(item_ids, 300)
+    recommender = TopKRecommender(user_ids, users, item_ids, items,
+                                  rated_users, rated_items, block_size=7)
+
+    a, scores = recommender.recommend_batch(user_ids, 5)
+    for row, user in enumerate(user_ids):
+        rated = set(rated_items[rated_users == user].tolist())
+        expected = [(-score, item) for item, score in zip(item_ids, items @ users[row])
+                    if item not in rated]
+        expected = [item for _, item in sorted(expected)[:5]]
+        assert a[row].tolist() == expected
+        assert np.all(np.diff(scores[row]) <= 0)
+
+    item, score = recommender.recommend(user_ids[3], 5)
+    assert item.tolist() == a[3].tolist()
@@ -0,0 +1,30 @@
+import numpy as np
+
+from answers.similarity import ItemSimilarityIndex
+
+
+def test_item_similarity_index():
+    rng = np.random.default_rng(0)
+    item_ids = np.arange(500, 800)
+    factors = rng.normal(size=(len(item_ids), 10))
+    # With one bit per table, probing the flipped bucket scans all items
+    index = ItemSimilarityIndex(item_ids, factors, n_tables=2, n_bits=1, probe_radius=1)
+    for item in item_ids[:20]:
+        a, scores = index.similar(item, 10)
+        exact, exact_scores = index.similar_exact(item, 10)
+        assert a.tolist() == exact.tolist()
+        assert item not in a.tolist()
+        row = item - 500
+        normalized = factors / np.linalg.norm(factors, axis=1, keepdims=True)
+        brute = np.argsort(-(normalized @ normalized[row]))[1:11] + 500
+        assert exact.tolist() == brute.tolist()
+
+
+def test_item_similarity_index_candidates():
+    rng = np.random.default_rng(1)
+    index = ItemSimilarityIndex(np.arange(1000), rng.normal(size=(1000, 16)),
+                                n_tables=4, n_bits=10)
+    a, scores = index.similar(3, 10)
+    assert len(a) <= 10
+    assert np.all(np.diff(scores) <= 0)
+    assert len(index.candidates(index.vectors[3])) < 1000
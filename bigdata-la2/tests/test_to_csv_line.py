@@ -0,0 +1,23 @@
+from answers.answer import init_spark, toCSVLine
+
+
+def test_to_csv_line_order():
+    spark = init_spark()
+    df = spark.range(0, 100, numPartitions=7).selectExpr("id", "id * 0.5 AS half")
+    expected = "".join("%d,%s\n" % (i, i * 0.5) for i in range(100))
+    assert toCSVLine(df) == expected
+    assert toCSVLine(df.rdd) == expected
+
+
+def test_to_csv_line_out(tmp_path):
+    spark = init_spark()
+    df = spark.range(0, 100, numPartitions=7)
+    path = tmp_path / "out.csv"
+    with open(path, "w") as out:
+        assert toCSVLine(df, out) is None
+    assert path.read_text() == "".join("%d\n" % i for i in range(100))
+
+
+def test_to_csv_line_empty():
+    spark = init_spark()
+    assert toCSVLine(spark.range(0, 100, numPartitions=3).where("id < 0")) == ""
@@ -1,3 +1,5 @@
+import contextlib
+import itertools
 import math
 import os
 import sys
@@ -12,10 +14,14 @@ from pyspark.sql import Row
 from pyspark.sql import DataFrame
 from pyspark.sql import SparkSession
 from pyspark.ml.fpm import FPGrowth
-from pyspark.sql.functions import size, abs
+from pyspark.sql.functions import size, abs, create_map, lit, monotonically_increasing_id
 from pyspark.sql.types import *
 import numpy as np
 
+from answers.bitsets import load_bitsets
+from answers.eclat import derive_rules, mine_local
+from answers.kmeans import kmeans_stages, run_kmeans
+
 '''
 INTRODUCTION
 
@@ -55,35 +61,137 @@ all_states = ["ab", "ak", "ar", "az", "ca", "co", "ct", "de", "dc", "fl",
               "yt", "dengl", "fraspm"]
 
 
-def init_spark():
-    spark = SparkSession \
-        .builder \
-        .appName("Python Spark SQL basic example") \
-        .config("spark.some.config.option", "some-value") \
-        .getOrCreate()
-    return spark
+# Settings of the shared Spark session: adaptive query execution
+# coalesces small shuffle partitions, Arrow speeds up conversions from
+# and to pandas, and Kryo is faster than Java serialization.
+SPARK_CONFIG = {
+    "spark.sql.adaptive.enabled": "true",
+    "spark.sql.adaptive.coalescePartitions.enabled": "true",
+    "spark.sql.execution.arrow.pyspark.enabled": "true",
+    "spark.serializer": "org.apache.spark.serializer.KryoSerializer",
+}
+
+# Input bytes per shuffle partition, see init_spark
+SHUFFLE_PARTITION_BYTES = 64 * 1024 * 1024
+MAX_SHUFFLE_PARTITIONS = 200
+
+_spark = None
+_spark_startup_seconds = None
 
 
-def toCSVLineRDD(rdd):
-    a = rdd.map(lambda row: ",".join([str(elt) for elt in row])) \
-        .reduce(lambda x, y: '\n'.join([x, y]))
-    return a + '\n'
+def _input_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, dirs, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
 
 
-def toCSVLine(data):
+def init_spark(*inputs):
+    '''
+    Return the Spark session shared by all the functions, creating it
+    with SPARK_CONFIG on first call (or after it was stopped). When input
+    files or directories are given, the number of shuffle partitions is
+    set to one per SHUFFLE_PARTITION_BYTES of input, between 1 and
+    MAX_SHUFFLE_PARTITIONS, instead of Spark's default of 200.
+    '''
+    global _spark, _spark_startup_seconds
+    if _spark is None or _spark.sparkContext._jsc is None:
+        start = time.perf_counter()
+        builder = SparkSession.builder.appName("Python Spark SQL basic example")
+        for key, value in SPARK_CONFIG.items():
+            builder = builder.config(key, value)
+        _spark = builder.getOrCreate()
+        _spark_startup_seconds = time.perf_counter() - start
+    if inputs:
+        size = sum(_input_bytes(path) for path in inputs)
+        partitions = min(MAX_SHUFFLE_PARTITIONS, max(1, -(-size // SHUFFLE_PARTITION_BYTES)))
+        _spark.conf.set("spark.sql.shuffle.partitions", partitions)
+    return _spark
+
+
+def spark_startup_seconds():
+    '''
+    Return the time (in seconds) taken to create the shared Spark
+    session, or None if it was not created yet.
+    '''
+    return _spark_startup_seconds
+
+
+def toCSVLineRDD(rdd, out=None):
+    """
+    Convert an RDD into CSV lines, in the order of the RDD, and return
+    them as a string. If the file object *out* is given, the lines are
+    written to it one partition at a time instead, and None is returned.
+    """
+    lines = rdd.map(lambda row: ",".join([str(elt) for elt in row]))
+    if out is not None:
+        out.writelines(line + '\n' for line in lines.toLocalIterator())
+        return None
+    # One string per partition, concatenated in partition order. An
+    # empty RDD gives an empty string, so that no separate count() job is
+    # needed to detect it.
+    chunks = lines.mapPartitions(lambda part: [''.join(line + '\n' for line in part)])
+    return ''.join(chunks.collect())
+
+
+def toCSVLine(data, out=None):
     if isinstance(data, RDD):
-        if data.count() > 0:
-            return toCSVLineRDD(data)
-        else:
-            return ""
+        return toCSVLineRDD(data, out)
     elif isinstance(data, DataFrame):
-        if data.count() > 0:
-            return toCSVLineRDD(data.rdd)
-        else:
-            return ""
+        return toCSVLineRDD(data.rdd, out)
+    elif isinstance(data, list):
+        # Rows computed without Spark
+        lines = (",".join([str(elt) for elt in row]) + '\n' for row in data)
+        if out is not None:
+            out.writelines(lines)
+            return None
+        return ''.join(lines)
     return None
 
 
+class SparkJobCount:
+    """
+    Number of Spark jobs counted by count_spark_jobs, in attribute
+    <jobs> (set when the counted block exits).
+    """
+
+    def __init__(self):
+        self.jobs = None
+
+
+_job_groups = itertools.count()
+
+
+@contextlib.contextmanager
+def count_spark_jobs(spark=None):
+    """
+    Context manager counting the Spark jobs started by the current thread
+    within its block, for instance to check that an export runs a single
+    action:
+
+        with count_spark_jobs() as count:
+            toCSVLine(data)
+        assert count.jobs == 1
+
+    The jobs are tagged with a dedicated job group, and the previous job
+    group of the thread is restored on exit.
+    """
+    sc = (spark or init_spark()).sparkContext
+    group = "count_spark_jobs-%d" % next(_job_groups)
+    previous = (sc.getLocalProperty("spark.jobGroup.id"),
+                sc.getLocalProperty("spark.job.description"),
+                sc.getLocalProperty("spark.job.interruptOnCancel"))
+    count = SparkJobCount()
+    sc.setJobGroup(group, "jobs counted by count_spark_jobs")
+    try:
+        yield count
+    finally:
+        count.jobs = len(sc.statusTracker().getJobIdsForGroup(group))
+        for key, value in zip(["spark.jobGroup.id", "spark.job.description",
+                               "spark.job.interruptOnCancel"], previous):
+            sc.setLocalProperty(key, value)
+
+
 '''
 PART 1: FREQUENT ITEMSETS
 
@@ -111,7 +219,7 @@ def data_frame(filename, n):
                   DataFrame should return the correct answer.
     Test file: tests/test_data_frame.py
     """
-    spark = init_spark()
+    spark = init_spark(filename)
     rdd = spark.sparkContext.textFile(filename).take(n)
     rdd = spark.sparkContext.parallelize(rdd) \
         .map(lambda line: line.split(",")) \
@@ -121,7 +229,150 @@ def data_frame(filename, n):
     return toCSVLine(rdd)
 
 
-def frequent_itemsets(filename, n, s, c):
+# fingerprint -> (spark, baskets DataFrame, number of baskets)
+_baskets_cache = {}
+
+# (fingerprint, min support, min confidence) -> MinedItemsets
+_mining_cache = {}
+
+# fingerprint -> MinedItemsets mined (not derived) with the lowest support
+_mining_base = {}
+
+
+def file_fingerprint(filename):
+    """
+    Return a tuple identifying the current content of *filename*: its
+    absolute path, size and modification time.
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+def load_baskets(filename):
+    """
+    Return the tuple (baskets, count) where baskets is the persisted
+    DataFrame (id, plants, items) of the data file, as in data_frame,
+    and count its number of rows. Both are cached per file fingerprint.
+    """
+    spark = init_spark(filename)
+    fingerprint = file_fingerprint(filename)
+    entry = _baskets_cache.get(fingerprint)
+    if entry is not None and entry[0] is spark:
+        return entry[1:]
+
+    # Drop the baskets (and mined itemsets) of older versions of the file
+    for stale in [key for key in _baskets_cache if key[0] == fingerprint[0]]:
+        old = _baskets_cache.pop(stale)
+        if old[0] is spark:
+            old[1].unpersist()
+    for stale in [key for key in _mining_cache if key[0][0] == fingerprint[0]]:
+        _mining_cache.pop(stale).unpersist()
+    for stale in [key for key in _mining_base if key[0] == fingerprint[0]]:
+        del _mining_base[stale]
+
+    rdd = spark.sparkContext.textFile(filename)
+    rdd = rdd.map(lambda line: line.split(",")) \
+        .zipWithIndex() \
+        .map(lambda pair: (pair[1], pair[0][0], list(pair[0][1:])))
+    df = spark.createDataFrame(rdd, ["id", "plants", "items"]).persist()
+    entry = (spark, df, df.count())
+    _baskets_cache[fingerprint] = entry
+    return entry[1:]
+
+
+class MinedItemsets:
+    """
+    Result of the FP-Growth mining of a data file with min support
+    <min_support> and min confidence <min_confidence>:
+    - freq_itemsets: persisted DataFrame (items, freq)
+    - association_rules: persisted DataFrame (antecedent, consequent,
+      confidence, lift, support)
+    - num_baskets: the number of baskets of the file
+    """
+
+    def __init__(self, spark, min_support, min_confidence, freq_itemsets, association_rules, num_baskets):
+        self.spark = spark
+        self.min_support = min_support
+        self.min_confidence = min_confidence
+        self.freq_itemsets = freq_itemsets
+        self.association_rules = association_rules
+        self.num_baskets = num_baskets
+
+    def unpersist(self):
+        if self.spark.sparkContext._jsc is not None:
+            self.freq_itemsets.unpersist()
+            self.association_rules.unpersist()
+
+
+ASSOCIATION_RULES_SCHEMA = StructType([
+    StructField("antecedent", ArrayType(StringType())),
+    StructField("consequent", ArrayType(StringType())),
+    StructField("confidence", DoubleType()),
+    StructField("lift", DoubleType()),
+    StructField("support", DoubleType()),
+])
+
+
+def mine_itemsets(filename, s, c):
+    """
+    Return the MinedItemsets of the FP-Growth model fitted on the baskets
+    of *filename* with min support <s> and min confidence <c>. Results
+    are cached per (file fingerprint, s, c), with their itemsets and
+    rules persisted, so that the queries on them (with any <n>) do not
+    mine the baskets again.
+
+    The itemsets frequent with support <s> are those of any lower
+    support whose frequency is at least ceil(s * num_baskets). So when
+    the file was already mined with a support lower than or equal to
+    <s>, the lowest-support itemsets are filtered instead of mining the
+    baskets again, and the rules are derived from them on the driver
+    for confidence <c>.
+    """
+    baskets, num_baskets = load_baskets(filename)
+    spark = init_spark(filename)
+    fingerprint = file_fingerprint(filename)
+    key = (fingerprint, s, c)
+    mined = _mining_cache.get(key)
+    if mined is not None and mined.spark is spark:
+        return mined
+
+    base = _mining_base.get(fingerprint)
+    if base is not None and base.spark is spark and base.min_support <= s:
+        # Same threshold as FPGrowth: minCount = ceil(minSupport * count)
+        min_count = math.ceil(s * num_baskets)
+        freq_itemsets = base.freq_itemsets.where(base.freq_itemsets.freq >= min_count).persist()
+        itemsets = [(row["items"], row["freq"]) for row in freq_itemsets.collect()]
+        rules = spark.createDataFrame(derive_rules(itemsets, c, num_baskets), ASSOCIATION_RULES_SCHEMA)
+        mined = MinedItemsets(spark, s, c, freq_itemsets, rules.persist(), num_baskets)
+    else:
+        fp_growth = FPGrowth(minSupport=s, minConfidence=c, itemsCol="items")
+        model = fp_growth.fit(baskets)
+        mined = MinedItemsets(spark, s, c, model.freqItemsets.persist(),
+                              model.associationRules.persist(), num_baskets)
+        _mining_base[fingerprint] = mined
+    _mining_cache[key] = mined
+    return mined
+
+
+def top_n(df, n, keys):
+    """
+    Return the DataFrame of the first <n> rows of *df* by descending
+    *keys* (columns or column names), ties being kept in the order of
+    *df*.
+
+    A sort followed by a limit is planned by Spark as
+    TakeOrderedAndProject: every partition keeps its <n> first rows in a
+    bounded priority queue, and only these rows are shuffled to a single
+    partition to be merged, instead of range-partitioning and sorting
+    the whole DataFrame.
+    """
+    ranked = df.withColumn("_position", monotonically_increasing_id())
+    order = [(ranked[key] if isinstance(key, str) else key).desc() for key in keys]
+    return ranked.sort(order + [ranked["_position"]]).limit(n).drop("_position")
+
+
+def frequent_itemsets(filename, n, s, c, engine="spark"):
     """
     Using the FP-Growth algorithm from the ML library (see
     http://spark.apache.org/docs/latest/ml-frequent-pattern-mining.html),
@@ -133,25 +384,24 @@ def frequent_itemsets(filename, n, s, c):
 
     Return value: a CSV string. As before, using toCSVLine may help.
     Test: tests/test_frequent_items.py
+
+    With engine='eclat', the itemsets are mined in process by
+    answers/eclat.py instead, without Spark.
     """
-    spark = init_spark()
-    rdd = spark.sparkContext.textFile(filename)
-    rdd = rdd.map(lambda line: line.split(",")) \
-        .zipWithIndex() \
-        .map(lambda pair: (pair[1], pair[0][0], list(pair[0][1:])))
-    df = spark.createDataFrame(rdd, ["id", "plants", "items"])
+    if engine == "eclat":
+        itemsets = mine_local(filename, s, c)[0]
+        return toCSVLine(sorted(itemsets, key=lambda x: (-len(x[0]), -x[1]))[:n])
+    if engine != "spark":
+        raise ValueError("Unknown engine: %s" % engine)
 
-    # Create FPGrowth model
-    fp_growth = FPGrowth(minSupport=s, minConfidence=c, itemsCol="items")
-    model = fp_growth.fit(df)
-    freq_itemsets = model.freqItemsets
+    freq_itemsets = mine_itemsets(filename, s, c).freq_itemsets
 
     # sort frequent itemsets by descending itemset size, then descending frequency
-    freq_itemsets = freq_itemsets.sort([size(freq_itemsets.items), "freq"], ascending=[False, False]).limit(n)
+    freq_itemsets = top_n(freq_itemsets, n, [size(freq_itemsets.items), "freq"])
     return toCSVLine(freq_itemsets)
 
 
-def association_rules(filename, n, s, c):
+def association_rules(filename, n, s, c, engine="spark"):
     """
     Using the same FP-Growth algorithm, write a script that returns the
     first <n> association rules obtained using min support <s> and min
@@ -161,22 +411,20 @@ def association_rules(filename, n, s, c):
 
     Return value: a CSV string.
     Test: tests/test_association_rules.py
+
+    With engine='eclat', the rules are mined in process by
+    answers/eclat.py instead, without Spark.
     """
-    spark = init_spark()
-    rdd = spark.sparkContext.textFile(filename)
-    rdd = rdd.map(lambda line: line.split(",")) \
-        .zipWithIndex() \
-        .map(lambda pair: (pair[1], pair[0][0], list(pair[0][1:])))
-    df = spark.createDataFrame(rdd, ["id", "plants", "items"])
+    if engine == "eclat":
+        rules = mine_local(filename, s, c)[1]
+        rules = sorted(rules, key=lambda x: (-len(x[0]), -x[2]))[:n]
+        return toCSVLine([rule[:3] for rule in rules])
+    if engine != "spark":
+        raise ValueError("Unknown engine: %s" % engine)
 
-    # Create FPGrowth model
-    fp_growth = FPGrowth(minSupport=s, minConfidence=c, itemsCol="items")
-    model = fp_growth.fit(df)
-    rules = model.associationRules.drop("lift").drop("support")
+    rules = mine_itemsets(filename, s, c).association_rules.drop("lift").drop("support")
 
-    rules = rules \
-        .sort([size(rules.antecedent), "confidence"], ascending=[False, False]) \
-        .limit(n)
+    rules = top_n(rules, n, [size(rules.antecedent), "confidence"])
 
     return toCSVLine(rules)
 
@@ -193,27 +441,21 @@ def interests(filename, n, s, c):
     Return value: a CSV string.
     Test: tests/test_interests.py
     '''
-    spark = init_spark()
-    # Convert CSV string to DataFrame
-    rdd = spark.sparkContext.textFile(filename)
-    rdd = rdd.map(lambda line: line.split(",")) \
-        .zipWithIndex() \
-        .map(lambda pair: (pair[1], pair[0][0], list(pair[0][1:])))
-    df = spark.createDataFrame(rdd, ["id", "plants", "items"])
-
-    # Create FPGrowth model
-    fp_growth = FPGrowth(minSupport=s, minConfidence=c, itemsCol="items")
-    model = fp_growth.fit(df)
-    rules = model.associationRules.drop("lift").drop("support")
-    freq = model.freqItemsets
-
-    join_sets = rules.join(freq, rules.consequent == freq.items)
-    total = df.count()
+    mined = mine_itemsets(filename, s, c)
+    rules = mined.association_rules.drop("lift").drop("support")
+    freq = mined.freq_itemsets
+
+    # Consequents are single items: look their frequency up in a map
+    # literal of the (few) frequent items instead of joining the rules
+    # with all the frequent itemsets.
+    items = freq.where(size(freq.items) == 1).collect()
+    item_freqs = create_map([lit(x) for row in items for x in (row["items"][0], row["freq"])])
+    join_sets = rules.withColumn("items", rules.consequent) \
+        .withColumn("freq", item_freqs[rules.consequent[0]])
+    total = mined.num_baskets
     join_sets = join_sets.withColumn("interest", abs(join_sets["confidence"] - join_sets["freq"] / total))
 
-    join_sets = join_sets \
-        .sort([size(join_sets.antecedent), "interest"], ascending=[False, False]) \
-        .limit(n)
+    join_sets = top_n(join_sets, n, [size(join_sets.antecedent), "interest"])
 
     return toCSVLine(join_sets)
 
@@ -254,19 +496,16 @@ def data_preparation(filename, plant, state):
 
     Return value: True if the plant occurs in the state and False otherwise.
     Test: tests/test_data_preparation.py
-    """
-    spark = init_spark()
-    rdd = spark.read.text(filename).rdd
-    rdd = rdd.map(lambda x: (x.value.split(',')[0], x.value.split(',')[1:])) \
-        .flatMap(lambda x: [(state, x[0]) for state in x[1]]) \
-        .groupByKey() \
-        .map(lambda x: (x[0], {plant: 1 for plant in set(x[1])}))
-
-    result = rdd.filter(lambda x: x[0] == state) \
-        .map(lambda x: plant in x[1].keys()) \
-        .collect()
 
-    return result[0]
+    The state vectors are the rows of the state matrix of the bitsets of
+    the file (see answers/bitsets.py), shared with the other functions of
+    this part.
+    """
+    bitsets = load_bitsets(filename)
+    row = bitsets.state_rows([state])[0]
+    if plant not in bitsets.plant_columns:
+        return False
+    return bool(bitsets.state_matrix()[row, bitsets.plant_columns[plant]])
 
 
 def distance2(filename, state1, state2):
@@ -276,24 +515,11 @@ def distance2(filename, state1, state2):
 
     Return value: an integer.
     Test: tests/test_distance.py
-    """
-    spark = init_spark()
-    rdd = spark.read.text(filename).rdd
-    rdd = rdd.map(lambda x: (x.value.split(',')[0], x.value.split(',')[1:])) \
-        .flatMap(lambda x: [(state, x[0]) for state in x[1]]) \
-        .groupByKey() \
-        .map(lambda x: (x[0], {plant: 1 for plant in set(x[1])}))
-
-    state_rdds = rdd.filter(lambda x: x[0] == state1 or x[0] == state2).collect()
-
-    state1_dict = state_rdds[0][1] if state_rdds[0][0] == state1 else state_rdds[1][1]
-    state2_dict = state_rdds[0][1] if state_rdds[0][0] == state2 else state_rdds[1][1]
-
-    keys = set(state1_dict.keys()) | set(state2_dict.keys())
-    values1 = np.array([state1_dict.get(k, 0) for k in keys])
-    values2 = np.array([state2_dict.get(k, 0) for k in keys])
 
-    return np.sum((values1 - values2) ** 2)
+    The distance is the popcount of the XOR of the plant bitsets of the
+    states (see answers/bitsets.py).
+    """
+    return load_bitsets(filename).distance2(state1, state2)
 
 
 def init_centroids(k, seed):
@@ -333,31 +559,20 @@ def first_iter(filename, k, seed):
 
     Test: tests/test_first_iter.py
     """
-    def squared_euclidean_distance(state1_dict, state2_dict):
-        keys = set(state1_dict.keys()) | set(state2_dict.keys())
-        values1 = np.array([state1_dict.get(k, 0) for k in keys])
-        values2 = np.array([state2_dict.get(k, 0) for k in keys])
-
-        return np.sum((values1 - values2) ** 2)
-
-    spark = init_spark()
+    bitsets = load_bitsets(filename)
+    matrix = bitsets.state_matrix()
     centroids = init_centroids(k, seed)
-    rdd = spark.read.text(filename).rdd
-    rdd = rdd.map(lambda x: (x.value.split(',')[0], x.value.split(',')[1:])) \
-        .flatMap(lambda x: [(state, x[0]) for state in x[1]]).filter(lambda x: x[0] in all_states) \
-        .groupByKey() \
-        .map(lambda x: (x[0], {plant: 1 for plant in set(x[1])}))
+    states = bitsets.found_states()
+    data, assign, _ = kmeans_stages(matrix[bitsets.state_rows(states)], k)
+    centroid_vectors = matrix[bitsets.state_rows(centroids)].astype(np.int64)
 
-    centroids_dict = rdd.filter(lambda x: x[0] in centroids).collect()
-    states = rdd.map(
-        lambda x: (x[0], {centroid[0]: squared_euclidean_distance(centroid[1], x[1]) for centroid in centroids_dict})). \
-        map(lambda x: (min(x[1], key=x[1].get), x[0])). \
-        groupByKey().mapValues(lambda x: sorted(list(x))).collectAsMap()
+    # Ties go to the first centroid, in the order of init_centroids
+    closest = assign(*data, centroid_vectors)
+    return {centroid: sorted(state for state, i in zip(states, closest) if i == j)
+            for j, centroid in enumerate(centroids)}
 
-    return {key: states[key] for key in centroids}
 
-
-def kmeans(filename, k, seed):
+def kmeans(filename, k, seed, on_iteration=None):
     """
     This function:
     1. Initializes <k> centroids.
@@ -374,44 +589,20 @@ def kmeans(filename, k, seed):
                   "on", and the second one contains the states "az"
                   and "ca".
     Test file: tests/test_kmeans.py
+
+    The iterations run on the cached state matrix (see
+    answers/bitsets.py) with answers.kmeans.run_kmeans and the stages of
+    answers.kmeans.kmeans_stages for <k>. run_kmeans calls
+    *on_iteration*, if given, with the timing and the number of states
+    changing cluster of every iteration.
     """
-    def squared_euclidean_distance(vec1, vec2):
-        return np.sum((np.array(vec1) - np.array(vec2)) ** 2)
-
-    spark = init_spark()
-    rdd = spark.read.text(filename).rdd
-    all_plants = rdd.map(lambda x: x.value.split(',')[0]).distinct().collect()
-
-    # (state_name, {plant_a: 1, plant_b: 1, ...})
-    rdd = rdd.map(lambda x: (x.value.split(',')[0], x.value.split(',')[1:])) \
-        .flatMap(lambda x: [(state, x[0]) for state in x[1]]) \
-        .filter(lambda x: x[0] in all_states) \
-        .groupByKey() \
-        .map(lambda x: (x[0], {plant: 1 for plant in set(x[1])}))
-    # build 0-1 vector for plant dictionary, 0 means plant not found in state, 1 means plant fount in state
-    rdd = rdd.map(lambda x: (x[0], [1 if plant in x[1].keys() else 0 for plant in all_plants]))
-
-    current_iteration = first_iter(filename, k, seed)
-    while True:
-        next_centroids = []
-        i = 0
-        for value in current_iteration.values():
-            plant_vectors = rdd.filter(lambda x: x[0] in value) \
-                .map(lambda x: x[1]) \
-                .collect()
-            next_centroids.append((i, np.mean(plant_vectors, axis=0)))
-            i += 1
-
-        next_iteration = rdd.map(lambda x: (
-            x[0], {centroid[0]: squared_euclidean_distance(centroid[1], x[1]) for centroid in next_centroids})). \
-            map(lambda x: (min(x[1], key=x[1].get), x[0])). \
-            groupByKey().mapValues(lambda x: sorted(list(x))).collectAsMap()
-
-        next_iteration = {centroid[0]: next_iteration[centroid[0]] for centroid in next_centroids}
-
-        if next_iteration == current_iteration:
-            break
-        else:
-            current_iteration = next_iteration
-
-    return list(current_iteration.values())
+    bitsets = load_bitsets(filename)
+    matrix = bitsets.state_matrix()
+    states = bitsets.found_states()
+    # Sparse stages for few centroids, dense ones above
+    data, assign, update = kmeans_stages(matrix[bitsets.state_rows(states)], k)
+    centroids = matrix[bitsets.state_rows(init_centroids(k, seed))].astype(np.float64)
+
+    # The first assignment is the one of first_iter
+    labels = run_kmeans(data, centroids, assign, update, on_iteration=on_iteration)[0]
+    return [sorted(state for state, i in zip(states, labels) if i == j) for j in range(k)]
@@ -0,0 +1,153 @@
+'''
+BITSET BASKETS
+
+Encoding of a data file (one plant per line, followed by the states
+where it is found) as bitsets packed into NumPy uint64 words:
+- by_plant[p] has bit s set if plant p is found in state s;
+- by_state[s] has bit p set if plant p is found in state s.
+Plants are numbered in file order, and states as in all_states, the
+states of the file missing from all_states being appended in order of
+first appearance.
+
+The support of an itemset (a set of states) is then the popcount of the
+AND of its rows of by_state, which answers/eclat.py computes for the
+frequent itemsets, and the squared Euclidean distance between two
+states (0/1 vectors over the plants) is the popcount of the XOR of their
+rows. This needs neither Spark nor a JVM.
+
+The clustering functions of answers/answer.py work on the dense uint8
+state-by-plant matrix unpacked from by_state (see state_matrix).
+'''
+import os
+
+import numpy as np
+
+from answers.all_states import all_states
+
+# (path, size, modification time) -> BasketBitsets
+_bitsets_cache = {}
+
+if hasattr(np, "bitwise_count"):
+    def popcount(words):
+        '''
+        Return the number of set bits of the uint64 array *words* along
+        its last axis.
+        '''
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    # NumPy < 2.0: count the bits of every byte with a lookup table
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        '''
+        Return the number of set bits of the uint64 array *words* along
+        its last axis.
+        '''
+        words = np.ascontiguousarray(words, dtype=np.uint64)
+        counts = _BYTE_COUNTS[words.view(np.uint8)]
+        return counts.reshape(words.shape[:-1] + (-1,)).sum(axis=-1, dtype=np.int64)
+
+
+def pack_bits(bits):
+    '''
+    Return the rows of the 2D boolean array *bits* packed into uint64
+    words: column j is bit j % 64 of word j // 64.
+    '''
+    packed = np.packbits(bits, axis=1, bitorder="little")
+    packed = np.pad(packed, [(0, 0), (0, -packed.shape[1] % 8)])
+    return np.ascontiguousarray(packed).view("<u8").astype(np.uint64)
+
+
+def read_baskets(filename):
+    '''
+    Return the list of [plant, state, ...] lists of the lines of
+    *filename*. Bytes that are not valid UTF-8 are replaced, as when
+    Spark reads the file.
+    '''
+    with open(filename, encoding="utf-8", errors="replace") as f:
+        return [line.rstrip("\r\n").split(",") for line in f]
+
+
+class BasketBitsets:
+    '''
+    Bitsets of the (plant, state) occurrences of a data file: *plants*
+    and *states* are the lists of names, and *bits* the boolean array of
+    shape (len(plants), len(states)).
+    '''
+
+    def __init__(self, plants, states, bits):
+        self.plants = plants
+        self.states = states
+        self.by_plant = pack_bits(bits)
+        self.by_state = pack_bits(bits.T)
+        self.plant_columns = {plant: column for column, plant in enumerate(plants)}
+        self._state_rows = {state: row for row, state in enumerate(states)}
+        self._state_matrix = None
+
+    @classmethod
+    def from_baskets(cls, baskets):
+        '''
+        Build from the [plant, state, ...] lists *baskets*.
+        '''
+        states = list(all_states)
+        rows = {state: row for row, state in enumerate(states)}
+        for basket in baskets:
+            for state in basket[1:]:
+                if state not in rows:
+                    rows[state] = len(states)
+                    states.append(state)
+        plant_rows = np.repeat(np.arange(len(baskets)), [len(basket) - 1 for basket in baskets])
+        state_rows = np.array([rows[state] for basket in baskets for state in basket[1:]], dtype=np.int64)
+        bits = np.zeros((len(baskets), len(states)), dtype=bool)
+        bits[plant_rows, state_rows] = True
+        return cls([basket[0] for basket in baskets], states, bits)
+
+    def state_rows(self, states):
+        '''
+        Return the array of the rows of *states* in by_state. Raise
+        KeyError for unknown states.
+        '''
+        return np.array([self._state_rows[state] for state in states], dtype=np.int64)
+
+    def state_matrix(self):
+        '''
+        Return the uint8 array of shape (len(states), len(plants)) whose
+        entry [s, p] is 1 if plant p is found in state s, unpacked from
+        by_state on first call.
+        '''
+        if self._state_matrix is None:
+            self._state_matrix = np.unpackbits(self.by_state.astype("<u8").view(np.uint8), axis=1,
+                                               count=len(self.plants), bitorder="little")
+        return self._state_matrix
+
+    def found_states(self):
+        '''
+        Return the states of all_states found in the file, in the order
+        of all_states.
+        '''
+        counts = popcount(self.by_state)
+        return [state for state in all_states if counts[self._state_rows[state]]]
+
+    def distance2(self, state1, state2):
+        '''
+        Return the squared Euclidean distance between the 0/1 plant
+        vectors of *state1* and *state2*.
+        '''
+        row1, row2 = self.state_rows([state1, state2])
+        return int(popcount(self.by_state[row1] ^ self.by_state[row2]))
+
+
+def load_bitsets(filename):
+    '''
+    Return the BasketBitsets of *filename*, cached per (path, size,
+    modification time).
+    '''
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    bitsets = _bitsets_cache.get(key)
+    if bitsets is None:
+        for stale in [old for old in _bitsets_cache if old[0] == path]:
+            del _bitsets_cache[stale]
+        bitsets = _bitsets_cache[key] = BasketBitsets.from_baskets(read_baskets(path))
+    return bitsets
@@ -0,0 +1,89 @@
+'''
+LOCAL FREQUENT ITEMSETS
+
+An alternative to Spark's FPGrowth for data files that fit on one
+machine, which does not need a Spark session (nor a JVM). The frequent
+itemsets are mined with Eclat over the bitsets of answers/bitsets.py:
+the plants of an itemset are the AND of the plant bitsets of its states
+(its tid-list), and every itemset is extended depth-first with the
+states following its last state, all the candidate extensions of an
+itemset being counted at once with one AND and one popcount.
+
+Results are those of FPGrowth with the same parameters: an itemset is
+frequent if its frequency is at least ceil(minSupport * number of
+baskets), and its states are listed by ascending frequency. Association
+rules have a single consequent and the other states of the itemset, in
+the same order, as antecedent.
+'''
+import math
+import weakref
+
+import numpy as np
+
+from answers.bitsets import load_bitsets, popcount
+
+# BasketBitsets -> {(min support, min confidence): (itemsets, rules)}
+_mining_cache = weakref.WeakKeyDictionary()
+
+
+def eclat(bitsets, min_count):
+    '''
+    Return the list of (states, freq) pairs of the itemsets of
+    *bitsets* found in at least <min_count> plants.
+    '''
+    counts = popcount(bitsets.by_state)
+    rows = np.argsort(counts, kind="stable")
+    rows = rows[counts[rows] >= min_count]
+    itemsets = []
+
+    def extend(prefix, rows, words, counts):
+        for i, row in enumerate(rows.tolist()):
+            itemset = prefix + [bitsets.states[row]]
+            itemsets.append((itemset, int(counts[i])))
+            if i + 1 < len(rows):
+                # Tid-lists of the extensions of itemset
+                next_words = words[i + 1:] & words[i]
+                next_counts = popcount(next_words)
+                frequent = next_counts >= min_count
+                if frequent.any():
+                    extend(itemset, rows[i + 1:][frequent], next_words[frequent], next_counts[frequent])
+
+    extend([], rows, bitsets.by_state[rows], counts[rows])
+    return itemsets
+
+
+def derive_rules(itemsets, min_confidence, num_baskets):
+    '''
+    Return the list of (antecedent, consequent, confidence, lift,
+    support) association rules of the (states, freq) pairs *itemsets*
+    with confidence at least <min_confidence>, as FPGrowth computes them.
+    *itemsets* must contain all the subsets of its itemsets.
+    '''
+    freqs = {frozenset(items): freq for items, freq in itemsets}
+    rules = []
+    for items, freq in itemsets:
+        if len(items) < 2:
+            continue
+        for item in items:
+            antecedent = [other for other in items if other != item]
+            confidence = freq / freqs[frozenset(antecedent)]
+            if confidence >= min_confidence:
+                lift = confidence / (freqs[frozenset([item])] / num_baskets)
+                rules.append((antecedent, [item], confidence, lift, freq / num_baskets))
+    return rules
+
+
+def mine_local(filename, s, c):
+    '''
+    Return the tuple (itemsets, rules) of the (states, freq) frequent
+    itemsets and of the association rules (see derive_rules) of
+    *filename* with min support <s> and min confidence <c>, cached per
+    file version, support and confidence.
+    '''
+    bitsets = load_bitsets(filename)
+    results = _mining_cache.setdefault(bitsets, {})
+    if (s, c) not in results:
+        num_baskets = len(bitsets.plants)
+        itemsets = eclat(bitsets, math.ceil(s * num_baskets))
+        results[(s, c)] = (itemsets, derive_rules(itemsets, c, num_baskets))
+    return results[(s, c)]
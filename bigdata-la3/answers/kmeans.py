@@ -0,0 +1,180 @@
+'''
+K-MEANS STAGES
+
+Building blocks of the kmeans of answers/answer.py, over the rows of a
+state-by-plant matrix (see BasketBitsets.state_matrix). They do not need Spark.
+
+The squared Euclidean distances between all the states and all the
+centroids are computed at once as
+
+    ||x||^2 - 2 x.c + ||c||^2
+
+that is, with one matrix product instead of one difference per (state,
+centroid) pair.
+
+The states are 0/1 vectors with few ones (a few thousand plants out of
+tens of thousands), so they can also be stored as the CSR index arrays
+(indptr, indices) of their plants: the plants of state i are
+indices[indptr[i]:indptr[i + 1]]. For such a state x, x.x is its number
+of plants and x.c the sum of the components of c at its plants, so the
+sparse_* stages only read the centroid components of the plants of each
+state, and never build the dense (float) state vectors. Their assignment
+takes one pass over the indices per centroid, while the dense one is a
+single matrix product whatever the number of centroids: kmeans_stages
+picks the sparse stages up to SPARSE_MAX_CENTROIDS centroids only.
+
+run_kmeans chains the stages: the states are assigned to the initial
+centroids, then the centroids are updated and the states reassigned
+until no state changes cluster.
+'''
+import collections
+import itertools
+import time
+
+import numpy as np
+
+
+def squared_distances(vectors, centroids):
+    '''
+    Return the array of shape (len(vectors), len(centroids)) of the
+    squared Euclidean distances between the rows of *vectors* and of
+    *centroids*. Exact for integer arrays.
+    '''
+    vector_norms = np.einsum("ij,ij->i", vectors, vectors)
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    return vector_norms[:, np.newaxis] - 2 * vectors @ centroids.T + centroid_norms[np.newaxis, :]
+
+
+def assign(vectors, centroids):
+    '''
+    Return the array of the index of the closest centroid of every row
+    of *vectors*, the first one on ties.
+    '''
+    return np.argmin(squared_distances(vectors, centroids), axis=1)
+
+
+def update_centroids(vectors, labels, centroids):
+    '''
+    Return the means of the rows of *vectors* assigned to every centroid
+    by *labels*, summed in one pass with the product of the (centroid,
+    row) indicator matrix and *vectors*. A centroid without rows keeps
+    its value in *centroids*.
+    '''
+    indicator = np.zeros((len(centroids), len(labels)))
+    indicator[labels, np.arange(len(labels))] = 1
+    sums = indicator @ vectors
+    return _means(sums, np.bincount(labels, minlength=len(centroids)), centroids)
+
+
+def _means(sums, counts, centroids):
+    found = counts > 0
+    updated = np.array(centroids, dtype=np.float64)
+    updated[found] = sums[found] / counts[found, np.newaxis]
+    return updated
+
+
+def sparse_rows(matrix):
+    '''
+    Return the CSR index arrays (indptr, indices) of the nonzero entries
+    of the 2D array *matrix*.
+    '''
+    rows, indices = np.nonzero(matrix)
+    indptr = np.zeros(len(matrix) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(matrix)), out=indptr[1:])
+    return indptr, indices
+
+
+def sparse_squared_distances(indptr, indices, centroids):
+    '''
+    Same as squared_distances, for the 0/1 vectors of CSR index arrays
+    *indptr* and *indices*: |x| - 2 x.c + ||c||^2.
+    '''
+    counts = np.diff(indptr)
+    dots = np.zeros((len(counts), len(centroids)), dtype=np.result_type(centroids, np.int64))
+    found = counts > 0
+    if found.any():
+        starts = indptr[:-1][found]
+        # Sums of the components of every centroid over the plants of every
+        # state, one centroid at a time: the gathered components take
+        # len(indices) values, not len(centroids) times more
+        for j, centroid in enumerate(centroids):
+            dots[found, j] = np.add.reduceat(centroid[indices], starts)
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    return counts[:, np.newaxis] - 2 * dots + centroid_norms[np.newaxis, :]
+
+
+def sparse_assign(indptr, indices, centroids):
+    '''
+    Same as assign, for the 0/1 vectors of CSR index arrays *indptr* and
+    *indices*.
+    '''
+    return np.argmin(sparse_squared_distances(indptr, indices, centroids), axis=1)
+
+
+def sparse_update_centroids(indptr, indices, labels, centroids):
+    '''
+    Same as update_centroids, for the 0/1 vectors of CSR index arrays
+    *indptr* and *indices*: the sums of every cluster count the states
+    of the cluster having each plant.
+    '''
+    k, dimension = centroids.shape
+    entry_labels = np.repeat(labels, np.diff(indptr))
+    sums = np.bincount(entry_labels * dimension + indices, minlength=k * dimension)
+    return _means(sums.reshape(k, dimension), np.bincount(labels, minlength=k), centroids)
+
+
+# Largest number of centroids for which an iteration of the sparse stages
+# is faster than one of the dense stages on data/plants.data (see
+# benchmarks/bench_sparse.py)
+SPARSE_MAX_CENTROIDS = 12
+
+
+def kmeans_stages(vectors, k):
+    '''
+    Return the tuple (data, assign, update) of the run_kmeans arguments
+    for the rows of the 0/1 array *vectors* and <k> centroids: the
+    sparse stages up to SPARSE_MAX_CENTROIDS centroids, the dense ones
+    (on float vectors) above.
+    '''
+    if k <= SPARSE_MAX_CENTROIDS:
+        return sparse_rows(vectors), sparse_assign, sparse_update_centroids
+    return (vectors.astype(np.float64),), assign, update_centroids
+
+
+# Statistics of one run_kmeans iteration, passed to its on_iteration callback
+KMeansIteration = collections.namedtuple("KMeansIteration",
+                                         ["iteration", "changed", "update_seconds", "assign_seconds"])
+
+
+def run_kmeans(data, centroids, assign=sparse_assign, update=sparse_update_centroids, on_iteration=None):
+    '''
+    Run k-means from the initial *centroids*, and return the tuple
+    (labels, centroids) of the final assignment and centroids.
+
+    *data* is the tuple of the arguments of the *assign* and *update*
+    stages before the centroids: (indptr, indices) for the sparse stages
+    (the default), (vectors,) for the dense ones.
+
+    After every iteration, *on_iteration* is called with its
+    KMeansIteration:
+    - iteration: 0 for the assignment to the initial centroids, then 1, 2...
+    - changed: number of states whose cluster changed (all the states at
+      iteration 0); the last iteration has none
+    - update_seconds: time of the centroid update (0 at iteration 0)
+    - assign_seconds: time of the assignment
+    '''
+    labels = None
+    for iteration in itertools.count():
+        start = time.perf_counter()
+        if labels is not None:
+            centroids = update(*data, labels, centroids)
+        updated = time.perf_counter()
+        next_labels = assign(*data, centroids)
+        assigned = time.perf_counter()
+
+        changed = len(next_labels) if labels is None else int((next_labels != labels).sum())
+        if on_iteration is not None:
+            on_iteration(KMeansIteration(iteration, changed, updated - start, assigned - updated))
+        if labels is not None and not changed:
+            return labels, centroids
+        labels = next_labels
@@ -0,0 +1,45 @@
+'''
+Time one k-means assignment pass over --states random 0/1 state vectors
+of --plants plants, for several numbers of centroids: with the original
+difference per (state, centroid) pair, and with answers.kmeans.assign.
+Run from the assignment directory:
+
+    python -m benchmarks.bench_assign --plants 35000
+'''
+import argparse
+import time
+
+import numpy as np
+
+from answers.kmeans import assign
+
+
+def assign_pairwise(vectors, centroids):
+    return np.array([np.argmin([np.sum((vector - c) ** 2) for c in centroids]) for vector in vectors])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--states", type=int, default=68)
+    parser.add_argument("--plants", type=int, default=35000)
+    parser.add_argument("-k", type=int, nargs="+", default=[2, 5, 10, 20])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = (rng.random((args.states, args.plants)) < 0.1).astype(np.float64)
+    for k in args.k:
+        centroids = vectors[rng.choice(args.states, k, replace=False)] * 0.5 + 0.25
+        timings = {}
+        results = {}
+        for name, function in [("pairwise", assign_pairwise), ("matrix", assign)]:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results[name] = function(vectors, centroids)
+            timings[name] = (time.perf_counter() - start) / args.repeat
+        assert (results["pairwise"] == results["matrix"]).all()
+        print("k=%-3d  pairwise %8.2f ms  matrix %8.2f ms" % (k, timings["pairwise"] * 1000, timings["matrix"] * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+'''
+Time frequent_itemsets and association_rules of answers.answer with
+engine='spark' (FPGrowth) and engine='eclat' (in process, over bitsets)
+for several min supports, and whether both engines return the same CSV
+(rows tied on the sort keys may be ordered differently). Run from the assignment directory:
+
+    python -m benchmarks.bench_engines --supports 0.05 0.1 0.2
+'''
+import argparse
+import os
+import time
+
+from answers.answer import association_rules, frequent_itemsets, init_spark
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", default=os.path.join("data", "plants.data"))
+    parser.add_argument("--supports", type=float, nargs="+", default=[0.05, 0.1, 0.2, 0.3])
+    parser.add_argument("--confidence", type=float, default=0.3)
+    parser.add_argument("-n", type=int, default=15)
+    args = parser.parse_args()
+
+    init_spark(args.data)
+    for s in args.supports:
+        results = {}
+        for engine in ["spark", "eclat"]:
+            start = time.perf_counter()
+            results[engine] = (frequent_itemsets(args.data, args.n, s, args.confidence, engine=engine),
+                               association_rules(args.data, args.n, s, args.confidence, engine=engine))
+            print("support %.3f  %-5s  %.2f s" % (s, engine, time.perf_counter() - start))
+        print("support %.3f  same output: %s" % (s, results["spark"] == results["eclat"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+'''
+Compare the original interests query, which joins the association rules
+with all the frequent itemsets on the consequent, with
+answers.answer.interests, which looks the consequent frequency up in a
+map of the frequent items, on --copies copies of --data. Both run on the
+same (cached) mining results. Run from the assignment directory:
+
+    python -m benchmarks.bench_interests --copies 100
+'''
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from pyspark.sql.functions import abs, size
+
+from answers.answer import interests, mine_itemsets, toCSVLine
+
+
+def interests_join(filename, n, s, c):
+    mined = mine_itemsets(filename, s, c)
+    rules = mined.association_rules.drop("lift").drop("support")
+    freq = mined.freq_itemsets
+    join_sets = rules.join(freq, rules.consequent == freq.items)
+    join_sets = join_sets.withColumn("interest", abs(join_sets["confidence"] - join_sets["freq"] / mined.num_baskets))
+    join_sets = join_sets \
+        .sort([size(join_sets.antecedent), "interest"], ascending=[False, False]) \
+        .limit(n)
+    return toCSVLine(join_sets)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", default=os.path.join("data", "plants.data"))
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("-s", type=float, default=0.1)
+    parser.add_argument("-c", type=float, default=0.3)
+    parser.add_argument("-n", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "plants.data")
+        with open(args.data, "rb") as src, open(filename, "wb") as dst:
+            for _ in range(args.copies):
+                src.seek(0)
+                shutil.copyfileobj(src, dst)
+
+        _, seconds = timed(mine_itemsets, filename, args.s, args.c)
+        print("mining               %.2f s" % seconds)
+        expected, seconds = timed(interests_join, filename, args.n, args.s, args.c)
+        print("interests (join)     %.2f s" % seconds)
+        result, seconds = timed(interests, filename, args.n, args.s, args.c)
+        print("interests (map)      %.2f s" % seconds)
+        assert result == expected
+
+
+if __name__ == "__main__":
+    main()
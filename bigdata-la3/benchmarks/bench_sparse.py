@@ -0,0 +1,62 @@
+'''
+Compare one k-means iteration (centroid update and assignment) over the
+states of --data stored as dense float vectors and as CSR index arrays
+(answers.kmeans.sparse_*), in time and in memory used by the state
+vectors, and the stages picked for k by answers.kmeans.kmeans_stages.
+The state matrix is built from answers.bitsets, without Spark. Run from
+the assignment directory:
+
+    python -m benchmarks.bench_sparse -k 2 3 10 14 20
+'''
+import argparse
+import os
+import time
+
+import numpy as np
+
+from answers.all_states import all_states
+from answers.bitsets import load_bitsets
+from answers.kmeans import (assign, kmeans_stages, sparse_assign, sparse_rows, sparse_update_centroids,
+                            update_centroids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", default=os.path.join("data", "plants.data"))
+    parser.add_argument("-k", type=int, nargs="+", default=[2, 3, 10, 14, 20])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bitsets = load_bitsets(args.data)
+    matrix = bitsets.state_matrix()[:len(all_states)]
+    vectors = matrix.astype(np.float64)
+    indptr, indices = sparse_rows(matrix)
+    print("dense vectors %10d bytes" % vectors.nbytes)
+    print("CSR arrays    %10d bytes" % (indptr.nbytes + indices.nbytes))
+
+    rng = np.random.default_rng(0)
+    for k in args.k:
+        labels = np.arange(len(vectors)) % k
+        rng.shuffle(labels)
+        centroids = np.zeros((k, vectors.shape[1]))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            dense = assign(vectors, update_centroids(vectors, labels, centroids))
+        dense_seconds = (time.perf_counter() - start) / args.repeat
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            sparse = sparse_assign(indptr, indices, sparse_update_centroids(indptr, indices, labels, centroids))
+        sparse_seconds = (time.perf_counter() - start) / args.repeat
+        data, assign_stage, update_stage = kmeans_stages(matrix, k)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            picked = assign_stage(*data, update_stage(*data, labels, centroids))
+        picked_seconds = (time.perf_counter() - start) / args.repeat
+        assert (dense == sparse).all() and (dense == picked).all()
+        print("k=%-3d  dense %8.2f ms  sparse %8.2f ms  kmeans_stages (%s) %8.2f ms"
+              % (k, dense_seconds * 1000, sparse_seconds * 1000,
+                 "sparse" if assign_stage is sparse_assign else "dense", picked_seconds * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+'''
+Time a sweep of --points min supports (from --min-support up to
+--max-support) over the baskets of --data, fitting FP-Growth for every
+support, then with answers.answer.mine_itemsets, which mines the lowest
+support once and derives the other supports from it. Run from the
+assignment directory:
+
+    python -m benchmarks.bench_support_sweep --points 10
+'''
+import argparse
+import os
+import time
+
+from pyspark.ml.fpm import FPGrowth
+
+from answers.answer import load_baskets, mine_itemsets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", default=os.path.join("data", "plants.data"))
+    parser.add_argument("--points", type=int, default=10)
+    parser.add_argument("--min-support", type=float, default=0.1)
+    parser.add_argument("--max-support", type=float, default=0.3)
+    parser.add_argument("--confidence", type=float, default=0.3)
+    args = parser.parse_args()
+
+    step = (args.max_support - args.min_support) / max(args.points - 1, 1)
+    supports = [args.min_support + i * step for i in range(args.points)]
+    baskets = load_baskets(args.data)[0]
+
+    start = time.perf_counter()
+    expected = {}
+    for s in supports:
+        model = FPGrowth(minSupport=s, minConfidence=args.confidence, itemsCol="items").fit(baskets)
+        expected[s] = (model.freqItemsets.count(), model.associationRules.count())
+    print("FP-Growth per support  %.2f s" % (time.perf_counter() - start))
+
+    # Lowest support first, so that it is the only one mined
+    start = time.perf_counter()
+    for s in supports:
+        mined = mine_itemsets(args.data, s, args.confidence)
+        assert (mined.freq_itemsets.count(), mined.association_rules.count()) == expected[s]
+    print("mine_itemsets          %.2f s" % (time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+'''
+Measure the shuffle bytes written by the frequent_itemsets,
+association_rules and interests queries of answers.answer, whose top <n>
+rows are selected with top_n (a bounded top-K per partition), and by the
+same queries with a full sort followed by a limit (obtained by setting
+spark.sql.execution.topKSortFallbackThreshold to 0). Shuffle bytes are
+read from the REST API of the Spark UI. Run from the assignment
+directory:
+
+    python -m benchmarks.bench_top_n --copies 10 -s 0.02
+'''
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+
+from answers.answer import association_rules, frequent_itemsets, init_spark, interests, mine_itemsets
+
+
+def shuffle_write_bytes(spark):
+    sc = spark.sparkContext
+    url = "%s/api/v1/applications/%s/stages?status=complete" % (sc.uiWebUrl, sc.applicationId)
+    with urllib.request.urlopen(url) as response:
+        return sum(stage["shuffleWriteBytes"] for stage in json.load(response))
+
+
+def measure(spark, query, *args):
+    before = shuffle_write_bytes(spark)
+    start = time.perf_counter()
+    result = query(*args)
+    seconds = time.perf_counter() - start
+    # The UI listener updates the stages asynchronously
+    time.sleep(1)
+    return result, seconds, shuffle_write_bytes(spark) - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", default=os.path.join("data", "plants.data"))
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("-s", type=float, default=0.02)
+    parser.add_argument("-c", type=float, default=0.3)
+    parser.add_argument("-n", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "plants.data")
+        with open(args.data, "rb") as src, open(filename, "wb") as dst:
+            for _ in range(args.copies):
+                src.seek(0)
+                shutil.copyfileobj(src, dst)
+
+        spark = init_spark(filename)
+        mined = mine_itemsets(filename, args.s, args.c)
+        print("%d itemsets, %d rules" % (mined.freq_itemsets.count(), mined.association_rules.count()))
+        for query in [frequent_itemsets, association_rules, interests]:
+            spark.conf.unset("spark.sql.execution.topKSortFallbackThreshold")
+            expected, seconds, shuffled = measure(spark, query, filename, args.n, args.s, args.c)
+            print("%-18s top_n      %7.2f s  %12d shuffle bytes" % (query.__name__, seconds, shuffled))
+            spark.conf.set("spark.sql.execution.topKSortFallbackThreshold", 0)
+            result, seconds, shuffled = measure(spark, query, filename, args.n, args.s, args.c)
+            print("%-18s full sort  %7.2f s  %12d shuffle bytes" % (query.__name__, seconds, shuffled))
+            assert result == expected
+        spark.conf.unset("spark.sql.execution.topKSortFallbackThreshold")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from answers.bitsets import BasketBitsets, load_bitsets, pack_bits, popcount
+
+
+def test_pack_bits():
+    bits = np.zeros((2, 70), dtype=bool)
+    bits[0, [0, 63, 64, 69]] = True
+    words = pack_bits(bits)
+    assert words.shape == (2, 2)
+    assert words[0].tolist() == [1 | 1 << 63, 1 | 1 << 5]
+    assert popcount(words).tolist() == [4, 0]
+
+
+def test_bitsets():
+    bitsets = BasketBitsets.from_baskets([["a", "qc", "on"], ["b", "qc"], ["c", "on", "xx"]])
+    assert bitsets.states[-1] == "xx"
+    qc, on = bitsets.by_state[bitsets.state_rows(["qc", "on"])]
+    assert popcount(qc) == 2
+    assert popcount(qc & on) == 1
+    assert bitsets.distance2("qc", "on") == 2
+
+
+def test_bitsets_plants():
+    bitsets = load_bitsets(os.path.join(".", "data", "plants.data"))
+    assert len(bitsets.plants) == 34781
+    assert bitsets.distance2("qc", "on") == 1708
+    assert bitsets.distance2("ca", "az") == 10718
+
+
+def test_state_matrix():
+    bitsets = BasketBitsets.from_baskets([["a", "qc", "on"], ["b", "qc"], ["c", "on", "xx"]])
+    matrix = bitsets.state_matrix()
+    assert bitsets.state_matrix() is matrix
+    assert matrix.shape == (len(bitsets.states), 3)
+    assert matrix[bitsets.state_rows(["qc", "on", "xx"])].tolist() == [[1, 1, 0], [1, 0, 1], [0, 0, 1]]
+    assert bitsets.plant_columns == {"a": 0, "b": 1, "c": 2}
+    assert bitsets.found_states() == ["on", "qc"]
@@ -0,0 +1,15 @@
+from answers.answer import count_spark_jobs, init_spark, toCSVLine
+
+
+def test_count_spark_jobs():
+    spark = init_spark()
+    data = spark.createDataFrame([(i, str(i)) for i in range(100)], ["id", "name"])
+    with count_spark_jobs(spark) as count:
+        a = toCSVLine(data.sort("id", ascending=False).limit(3))
+    assert a == "99,99\n98,98\n97,97\n"
+    assert count.jobs == 1
+
+    with count_spark_jobs(spark) as count:
+        a = toCSVLine(data.where("id < 0"))
+    assert a == ""
+    assert count.jobs == 1
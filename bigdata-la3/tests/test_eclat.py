@@ -0,0 +1,22 @@
+import os
+
+from answers.bitsets import BasketBitsets
+from answers.eclat import eclat, mine_local
+
+
+def test_eclat():
+    bitsets = BasketBitsets.from_baskets([["a", "qc", "on"], ["b", "qc"], ["c", "on", "qc", "ab"]])
+    # States by ascending frequency: ab (1), on (2), qc (3)
+    assert sorted(eclat(bitsets, 2)) == [(["on"], 2), (["on", "qc"], 2), (["qc"], 3)]
+    assert len(eclat(bitsets, 1)) == 7
+
+
+def test_mine_local():
+    itemsets, rules = mine_local(os.path.join(".", "data", "plants.data"), 0.1, 0.3)
+    top = sorted(itemsets, key=lambda x: (-len(x[0]), -x[1]))[:15]
+    expected = open(os.path.join(".", "tests", "frequent_items.txt"), "r").read()
+    assert "".join("%s,%s\n" % itemset for itemset in top) == expected
+
+    top = sorted(rules, key=lambda x: (-len(x[0]), -x[2]))[:15]
+    expected = open(os.path.join(".", "tests", "association_rules.txt"), "r").read()
+    assert "".join("%s,%s,%s\n" % rule[:3] for rule in top) == expected
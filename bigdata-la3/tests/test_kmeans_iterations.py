@@ -0,0 +1,33 @@
+import os
+
+from answers import answer
+from answers.answer import kmeans
+from answers.kmeans import kmeans_stages
+
+
+def test_kmeans_updates(monkeypatch):
+    updates = []
+    iterations = []
+
+    def counted_stages(vectors, k):
+        data, assign, update = kmeans_stages(vectors, k)
+
+        def counted_update(*args):
+            updates.append(len(iterations))
+            return update(*args)
+        return data, assign, counted_update
+
+    monkeypatch.setattr(answer, "kmeans_stages", counted_stages)
+    # One centroid update per iteration after the first, with the sparse
+    # and the dense stages
+    for k, seed in [(2, 7070), (14, 28447)]:
+        del updates[:], iterations[:]
+        kmeans(os.path.join(".", "data", "plants.data"), k, seed, on_iteration=iterations.append)
+        assert updates == list(range(1, len(iterations)))
+
+
+def test_kmeans_on_iteration():
+    iterations = []
+    kmeans(os.path.join(".", "data", "plants.data"), 10, 123, on_iteration=iterations.append)
+    assert iterations[0].changed == 68
+    assert iterations[-1].changed == 0
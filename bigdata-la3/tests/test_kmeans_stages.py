@@ -0,0 +1,75 @@
+import numpy as np
+
+from answers.kmeans import (SPARSE_MAX_CENTROIDS, assign, kmeans_stages, run_kmeans, sparse_assign, sparse_rows,
+                            sparse_squared_distances, sparse_update_centroids, squared_distances,
+                            update_centroids)
+
+
+def test_squared_distances():
+    rng = np.random.default_rng(0)
+    vectors = rng.integers(0, 2, size=(20, 50))
+    centroids = rng.random((4, 50))
+    expected = ((vectors[:, np.newaxis, :] - centroids[np.newaxis, :, :]) ** 2).sum(axis=2)
+    assert np.allclose(squared_distances(vectors, centroids), expected)
+    assert (squared_distances(vectors, vectors[:3]) == ((vectors[:, np.newaxis] - vectors[:3]) ** 2).sum(axis=2)).all()
+
+
+def test_assign_ties():
+    vectors = np.array([[0, 0], [1, 1], [1, 0]])
+    centroids = np.array([[0, 1], [1, 0], [0, 1]])
+    # [0, 0] and [1, 1] are at distance 1 of all the centroids
+    assert assign(vectors, centroids).tolist() == [0, 0, 1]
+
+
+def test_update_centroids():
+    vectors = np.array([[1, 0], [0, 1], [1, 1]])
+    centroids = np.array([[0.0, 0.0], [5.0, 5.0], [2.0, 2.0]])
+    # Centroid 1 has no rows and is kept
+    updated = update_centroids(vectors, np.array([0, 2, 0]), centroids)
+    assert updated.tolist() == [[1.0, 0.5], [5.0, 5.0], [0.0, 1.0]]
+
+
+def test_sparse_stages():
+    rng = np.random.default_rng(1)
+    vectors = (rng.random((30, 200)) < 0.1).astype(np.int64)
+    vectors[3] = 0
+    indptr, indices = sparse_rows(vectors)
+    centroids = rng.random((5, 200))
+    assert np.allclose(sparse_squared_distances(indptr, indices, centroids),
+                       squared_distances(vectors, centroids))
+    # Exact for integer centroids
+    assert (sparse_squared_distances(indptr, indices, vectors[:4]) == squared_distances(vectors, vectors[:4])).all()
+    labels = assign(vectors, centroids)
+    assert (sparse_assign(indptr, indices, centroids) == labels).all()
+    assert (sparse_update_centroids(indptr, indices, labels, centroids) ==
+            update_centroids(vectors, labels, centroids)).all()
+
+
+def test_run_kmeans():
+    rng = np.random.default_rng(2)
+    vectors = (rng.random((40, 100)) < 0.2).astype(np.int64)
+    centroids = vectors[:4].astype(np.float64)
+    iterations = []
+    labels, final = run_kmeans(sparse_rows(vectors), centroids, on_iteration=iterations.append)
+    assert [it.iteration for it in iterations] == list(range(len(iterations)))
+    assert iterations[0].changed == 40
+    assert iterations[-1].changed == 0
+    assert all(it.changed > 0 for it in iterations[:-1])
+    # Same result with the dense stages
+    dense_labels, dense_final = run_kmeans((vectors,), centroids, assign, update_centroids)
+    assert (labels == dense_labels).all()
+    assert np.allclose(final, dense_final)
+
+
+def test_kmeans_stages():
+    rng = np.random.default_rng(3)
+    vectors = (rng.random((40, 100)) < 0.2).astype(np.uint8)
+    data, sparse_stage, _ = kmeans_stages(vectors, SPARSE_MAX_CENTROIDS)
+    assert sparse_stage is sparse_assign
+    assert all((a == b).all() for a, b in zip(data, sparse_rows(vectors)))
+    data, dense_stage, update = kmeans_stages(vectors, SPARSE_MAX_CENTROIDS + 1)
+    assert (dense_stage, update) == (assign, update_centroids)
+    assert data[0].dtype == np.float64
+    centroids = vectors[:SPARSE_MAX_CENTROIDS + 1].astype(np.float64)
+    assert (run_kmeans(data, centroids, dense_stage, update)[0] ==
+            run_kmeans(sparse_rows(vectors), centroids)[0]).all()
@@ -0,0 +1,34 @@
+import os
+
+from pyspark.ml.fpm import FPGrowth
+
+from answers.answer import frequent_itemsets, load_baskets, mine_itemsets
+
+
+def test_mine_itemsets():
+    filename = os.path.join(".", "data", "plants.data")
+    mined = mine_itemsets(filename, 0.1, 0.3)
+    assert mined.num_baskets == 34781
+    # The model is fitted once per file, support and confidence
+    assert mine_itemsets(filename, 0.1, 0.3) is mined
+    assert mine_itemsets(filename, 0.1, 0.5) is not mined
+
+    expected = open(os.path.join(".", "tests", "frequent_items.txt"), "r").read()
+    a = frequent_itemsets(filename, 5, 0.1, 0.3)
+    assert a == "".join(expected.splitlines(True)[:5])
+
+
+def test_mine_itemsets_higher_support():
+    filename = os.path.join(".", "data", "plants.data")
+    mine_itemsets(filename, 0.1, 0.3)
+    # Derived from the itemsets mined with support 0.1
+    derived = mine_itemsets(filename, 0.15, 0.5)
+
+    baskets = load_baskets(filename)[0]
+    model = FPGrowth(minSupport=0.15, minConfidence=0.5, itemsCol="items").fit(baskets)
+    itemsets = lambda df: sorted((tuple(sorted(row["items"])), row["freq"]) for row in df.collect())
+    assert itemsets(derived.freq_itemsets) == itemsets(model.freqItemsets)
+    rules = lambda df: sorted((tuple(sorted(row["antecedent"])), row["consequent"][0],
+                               round(row["confidence"], 12), round(row["lift"], 12))
+                              for row in df.collect())
+    assert rules(derived.association_rules) == rules(model.associationRules)
@@ -0,0 +1,12 @@
+from answers.answer import init_spark, top_n
+
+
+def test_top_n():
+    spark = init_spark()
+    df = spark.createDataFrame([(i, i % 3) for i in range(100)], ["id", "key"]).repartition(4, "id")
+    ids = [row["id"] for row in df.collect()]
+    top = top_n(df, 5, ["key"])
+    # Ties are kept in the order of the DataFrame
+    assert [row["id"] for row in top.collect()] == [i for i in ids if i % 3 == 2][:5]
+    assert top.columns == ["id", "key"]
+    assert "TakeOrderedAndProject" in top._jdf.queryExecution().executedPlan().toString()